@@ -0,0 +1,23 @@
+"""Synthetic job-post text shared by the benchmarks."""
+import random
+
+SENTENCES = [
+    "We are looking for a developer with 3+ years of experience building web applications.",
+    "You will design, implement and maintain scalable backend services and REST APIs.",
+    "Experience with cloud platforms, CI/CD pipelines and automated testing is a plus.",
+    "Collaborate with product managers and designers to ship features our customers love.",
+    "Strong communication skills and the ability to work in an agile team are required.",
+    "At least 2 years of experience in an agile team is required.",
+]
+
+
+def description(rng: random.Random, n_sentences: int = 3) -> str:
+    return " ".join(rng.sample(SENTENCES, n_sentences))
+
+
+def synthetic_posts(n: int, skills: list, rng: random.Random, n_required: int = 8) -> list:
+    posts = []
+    for _ in range(n):
+        required = ", ".join(rng.sample(skills, n_required))
+        posts.append(f"{rng.choice(skills)} Developer. Requirements: {required}. {description(rng)}")
+    return posts
@@ -0,0 +1,113 @@
+"""Course stats: the old fan-out join vs pre-aggregated subqueries vs the course_stats view.
+
+Seeds courses, contents and reviews (many reviews per course) into a scratch schema of
+a local Postgres, applies sql/course_stats.sql there and times each way of reading the
+per-course stats. Also reports how many courses the fan-out join gets wrong.
+Needs a reachable Postgres (DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD). Run from the repo root:
+    python -m benchmarks.bench_course_stats --courses 2000 --contents 30 --reviews 500
+"""
+import argparse
+import asyncio
+import time
+
+import asyncpg
+import numpy as np
+
+from services import db
+from services.course_index import STATS_QUERY, STATS_VIEW_QUERY, STATS_VIEW_REFRESH
+
+SCHEMA = "bench_course_stats"
+
+# The query the course index used before pre-aggregation
+FAN_OUT_QUERY = """
+    SELECT
+        c.id,
+        COALESCE(SUM(CASE WHEN cc.type = 'video' THEN cc.video_time_minutes ELSE 0 END), 0) AS total_video_minutes,
+        COUNT(cc.*) FILTER (WHERE cc.type IN ('video', 'quiz')) AS total_lessons,
+        ROUND(AVG(cr.rating)::numeric, 1) AS average_rating
+    FROM courses c
+    LEFT JOIN course_contents cc ON c.id = cc.course_id
+    LEFT JOIN course_reviews cr ON c.id = cr.course_id
+    WHERE c.name IS NOT NULL AND c.description IS NOT NULL
+    GROUP BY c.id
+"""
+
+
+async def seed(conn, courses: int, contents: int, reviews: int):
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+    await conn.execute("""
+        CREATE TABLE courses (id integer PRIMARY KEY, name text, description text);
+        CREATE TABLE course_contents (id serial PRIMARY KEY, course_id integer, type text, video_time_minutes integer);
+        CREATE TABLE course_reviews (id serial PRIMARY KEY, course_id integer, rating integer);
+    """)
+    # Popularity is skewed: review counts per course range from 0 to 2x the mean
+    await conn.execute(f"""
+        INSERT INTO courses SELECT i, 'Course ' || i, 'Description ' || i FROM generate_series(1, {courses}) i;
+        INSERT INTO course_contents (course_id, type, video_time_minutes)
+        SELECT c, (ARRAY['video', 'quiz', 'article'])[1 + (random() * 2.99)::int], 1 + (random() * 30)::int
+        FROM generate_series(1, {courses}) c, generate_series(1, {contents});
+        INSERT INTO course_reviews (course_id, rating)
+        SELECT c, 1 + (random() * 4)::int
+        -- Referencing c makes the series lateral, so random() is drawn per course
+        FROM generate_series(1, {courses}) c, generate_series(1, (random() * {2 * reviews} + c * 0)::int);
+        ANALYZE;
+    """)
+
+
+async def timed(conn, query: str, runs: int):
+    rows, latencies = None, []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = await conn.fetch(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return rows, np.array(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=2000)
+    parser.add_argument("--contents", type=int, default=30, help="content rows per course")
+    parser.add_argument("--reviews", type=int, default=500, help="mean reviews per course")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(
+        host=db.DB_HOST, port=db.DB_PORT, database=db.DB_NAME, user=db.DB_USER, password=db.DB_PASSWORD
+    )
+    try:
+        start = time.perf_counter()
+        await seed(conn, args.courses, args.contents, args.reviews)
+        print(f"Seeded {args.courses} courses x {args.contents} contents, ~{args.reviews} reviews each "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        fan_out, fan_out_ms = await timed(conn, FAN_OUT_QUERY, args.runs)
+        with open("sql/course_stats.sql", encoding="utf-8") as f:
+            await conn.execute(f.read())
+        await conn.execute(f"VACUUM ANALYZE {SCHEMA}.course_contents")
+        await conn.execute(f"VACUUM ANALYZE {SCHEMA}.course_reviews")
+        subqueries, subqueries_ms = await timed(conn, STATS_QUERY, args.runs)
+        _, refresh_ms = await timed(conn, STATS_VIEW_REFRESH, args.runs)
+        view, view_ms = await timed(conn, STATS_VIEW_QUERY, args.runs)
+
+        print(f"{'query':<28}{'p50 ms':>10}{'max ms':>10}")
+        for label, latencies in (("fan-out join (old)", fan_out_ms), ("pre-aggregated subqueries", subqueries_ms),
+                                 ("view refresh (concurrent)", refresh_ms), ("view read", view_ms)):
+            print(f"{label:<28}{np.percentile(latencies, 50):>10.1f}{latencies.max():>10.1f}")
+
+        expected = {row["id"]: (row["total_video_minutes"], row["total_lessons"], row["average_rating"]) for row in subqueries}
+        from_view = {row["id"]: (row["total_video_minutes"], row["total_lessons"], row["average_rating"]) for row in view}
+        wrong = sum(
+            (row["total_video_minutes"], row["total_lessons"]) != expected[row["id"]][:2] for row in fan_out
+        )
+        print(f"view matches subqueries: {from_view == expected}")
+        print(f"fan-out join wrong on {wrong} / {len(fan_out)} courses "
+              f"(e.g. lessons {fan_out[0]['total_lessons']} vs {expected[fan_out[0]['id']][1]})")
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Connect-per-request vs the asyncpg pool, under concurrent load.
+
+Needs a reachable Postgres (DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD). Run from the repo root:
+    python -m benchmarks.bench_db_pool --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import asyncpg
+import numpy as np
+
+from services import db
+
+
+async def run(label, requests, concurrency, handler):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies)
+    print(f"{label:<22}{requests / elapsed:>10.0f}{np.percentile(latencies, 50):>10.2f}"
+          f"{np.percentile(latencies, 95):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query", default="SELECT 1")
+    args = parser.parse_args()
+
+    async def connect_per_request():
+        conn = await asyncpg.connect(
+            host=db.DB_HOST, port=db.DB_PORT, database=db.DB_NAME, user=db.DB_USER, password=db.DB_PASSWORD
+        )
+        try:
+            await conn.fetch(args.query)
+        finally:
+            await conn.close()
+
+    async def pooled():
+        async with db.acquire() as conn:
+            await conn.fetch(args.query)
+
+    print(f"{'mode':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    await run("connect per request", args.requests, args.concurrency, connect_per_request)
+    await db.init_pool()
+    await run(f"pool ({db.DB_POOL_MIN_SIZE}-{db.DB_POOL_MAX_SIZE})", args.requests, args.concurrency, pooled)
+    print("pool wait:", db.pool_stats())
+    await db.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Encoding throughput on a realistic length mix: plain model.encode vs length-bucketed batches.
+
+Texts mix one-line profiles, job posts and multi-page CVs (log-normal word counts).
+Compares:
+    - plain:     model.encode(texts, batch_size=32), over-length texts truncated
+    - bucketed:  services.encoding.encode_texts without splitting (same truncation)
+    - split:     services.encoding.encode_texts, long texts pooled over passages
+Needs sentence-transformers. Run from the repo root:
+    python -m benchmarks.bench_encoding --texts 1000 --model all-mpnet-base-v2
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmarks._corpus import SENTENCES
+from services.encoding import encode_texts
+from services.model_registry import get_sentence_transformer
+from services.vector_index import normalize_rows
+
+
+def realistic_texts(n: int, skills: list, rng: random.Random) -> list:
+    texts = []
+    for _ in range(n):
+        # Median ~60 words, a long tail of multi-page CVs (a few thousand words)
+        n_words = int(min(max(rng.lognormvariate(4.1, 1.1), 3), 4000))
+        words = []
+        while len(words) < n_words:
+            words.extend(rng.choice(SENTENCES).split())
+            words.extend(rng.sample(skills, 2))
+        texts.append(" ".join(words[:n_words]))
+    return texts
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=8192)
+    args = parser.parse_args()
+
+    with open("./skills-dataset/kaggle_skills.json", encoding="utf-8") as f:
+        skills = json.load(f)
+    texts = realistic_texts(args.texts, skills, random.Random(0))
+    model = get_sentence_transformer(args.model)
+    model.encode(texts[:4])
+
+    lengths = np.array([len(ids) for ids in model.tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]])
+    max_tokens = model.max_seq_length - 2
+    print(f"{len(texts)} texts, tokens p50 {np.percentile(lengths, 50):.0f} / p95 {np.percentile(lengths, 95):.0f} "
+          f"/ max {lengths.max()}, {np.mean(lengths > max_tokens):.1%} over {max_tokens}, "
+          f"{np.maximum(lengths - max_tokens, 0).sum() / lengths.sum():.1%} of all tokens past the limit")
+
+    plain, plain_s = timed(lambda: np.asarray(model.encode(texts, batch_size=args.batch_size)))
+    bucketed, bucketed_s = timed(lambda: encode_texts(model, texts, args.batch_size, args.token_budget, split_long=False))
+    split, split_s = timed(lambda: encode_texts(model, texts, args.batch_size, args.token_budget, split_long=True))
+
+    plain, bucketed, split = normalize_rows(plain), normalize_rows(bucketed), normalize_rows(split)
+    long_texts = lengths > max_tokens
+    print(f"{'mode':<10}{'seconds':>9}{'texts/s':>10}{'tokens/s':>11}{'min cos vs plain':>18}")
+    for label, vectors, seconds in (("plain", plain, plain_s), ("bucketed", bucketed, bucketed_s), ("split", split, split_s)):
+        cosines = np.sum(vectors * plain, axis=1)
+        print(f"{label:<10}{seconds:>9.2f}{len(texts) / seconds:>10.1f}{lengths.sum() / seconds:>11.0f}{cosines.min():>18.4f}")
+    if long_texts.any():
+        print(f"split vs truncated on the {long_texts.sum()} long texts: mean cos "
+              f"{np.sum(split[long_texts] * plain[long_texts], axis=1).mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""The structured recommender (/recommend) vs the cascade engine (/v2/recommend), on the same payloads.
+
+Both engines run in-process, without HTTP. Reports latency per request and how much their
+top-k jobs and services agree (|top-k A & top-k B| / k). Needs the sentence-transformers
+models and en_core_web_sm. Run from the repo root:
+    python -m benchmarks.bench_engines --requests 20 --posts 200 --k 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmarks._corpus import description
+from routers import amr_recommender
+from services import recommender
+
+
+def synthetic_payload(n_posts: int, skills: list, rng: random.Random) -> dict:
+    developer_skills = rng.sample(skills, 8)
+    return {
+        "developer": {
+            "id": f"dev-{rng.randrange(10 ** 6)}",
+            "brief_bio": f"Developer working with {', '.join(developer_skills[:4])}.",
+            "skills": developer_skills,
+            "years_of_experience": rng.randint(0, 10),
+            "previous_job": f"{rng.choice(developer_skills)} developer",
+            "track_level": rng.choice(["junior", "mid", "senior"]),
+        },
+        "job_posts": [
+            {
+                "id": f"job-{i}",
+                "title": f"{rng.choice(skills)} Developer",
+                "job_description": description(rng, 3),
+                "skills": rng.sample(skills, 4) + rng.sample(developer_skills, rng.randint(0, 3)),
+            }
+            for i in range(n_posts)
+        ],
+        "service_posts": [
+            {
+                "id": f"service-{i}",
+                "title": f"{rng.choice(skills)} project",
+                "description": description(rng, 2),
+                "required_skills": rng.sample(skills, 3) + rng.sample(developer_skills, rng.randint(0, 2)),
+            }
+            for i in range(n_posts // 2)
+        ],
+    }
+
+
+def run_structured(payload: dict):
+    response = asyncio.run(amr_recommender.recommend(amr_recommender.RecommendationRequest(**payload)))
+    return ([item.id for item in response.job_recommendations],
+            [item.id for item in response.service_recommendations])
+
+
+def run_cascade(payload: dict):
+    result = recommender.recommend_for_developer(payload["developer"], payload["job_posts"], payload["service_posts"])
+    return ([item["id"] for item in result["job_recommendations"]],
+            [item["id"] for item in result["service_recommendations"]])
+
+
+def agreement(a: list, b: list, k: int) -> float:
+    k = min(k, len(a), len(b))
+    return len(set(a[:k]) & set(b[:k])) / k if k else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    with open("./skills-dataset/kaggle_skills.json", encoding="utf-8") as f:
+        skills = json.load(f)
+    rng = random.Random(0)
+    payloads = [synthetic_payload(args.posts, skills, rng) for _ in range(args.requests)]
+
+    # Model loading is not what we measure
+    amr_recommender.warm_up_structured_recommender()
+    recommender.warm_up_recommender()
+    run_structured(payloads[0])
+    run_cascade(payloads[0])
+
+    latencies = {"structured (/recommend)": [], "cascade (/v2/recommend)": []}
+    job_agreement, service_agreement = [], []
+    for payload in payloads:
+        start = time.perf_counter()
+        structured = run_structured(payload)
+        latencies["structured (/recommend)"].append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        cascade = run_cascade(payload)
+        latencies["cascade (/v2/recommend)"].append((time.perf_counter() - start) * 1000)
+        job_agreement.append(agreement(structured[0], cascade[0], args.k))
+        service_agreement.append(agreement(structured[1], cascade[1], args.k))
+
+    print(f"{args.requests} requests x {args.posts} jobs + {args.posts // 2} services")
+    print(f"{'engine':<26}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for label, values in latencies.items():
+        values = np.array(values)
+        print(f"{label:<26}{np.percentile(values, 50):>10.1f}{np.percentile(values, 95):>10.1f}{values.mean():>10.1f}")
+    print(f"top-{args.k} agreement: jobs {np.nanmean(job_agreement):.3f}, services {np.nanmean(service_agreement):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Latency, throughput and similarity drift of the int8 model backend vs fp32.
+
+For each model, on a fixed corpus of synthetic posts and developer profiles:
+    - single-text latency (one developer profile per call, as a request does)
+    - batch throughput (texts/s encoding the whole corpus)
+    - drift vs fp32: cosine between the fp32 and int8 embedding of each text, and
+      top-k agreement of profile -> post retrieval; for the cross-encoder, the score
+      difference and Spearman correlation of the scores.
+Needs torch and sentence-transformers. Run from the repo root:
+    python -m benchmarks.bench_model_backends --posts 500 --threads 1 4
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+from scipy.stats import spearmanr
+
+from benchmarks._corpus import description
+from services import model_registry
+from services.vector_index import normalize_rows, top_k_indices
+
+BI_ENCODERS = ["all-mpnet-base-v2", "all-MiniLM-L6-v2"]
+CROSS_ENCODER = "cross-encoder/ms-marco-TinyBERT-L-6"
+
+
+def fixed_corpus(n_posts: int, skills: list):
+    rng = random.Random(0)
+    posts = [
+        f"{rng.choice(skills)} Developer {', '.join(rng.sample(skills, 4))} {description(rng)}"
+        for _ in range(n_posts)
+    ]
+    profiles = [
+        f"Developer working with {', '.join(rng.sample(skills, 6))}. {rng.randint(0, 10)} years of experience."
+        for _ in range(max(n_posts // 10, 10))
+    ]
+    return posts, profiles
+
+
+def latency_ms(fn, texts: list) -> np.ndarray:
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        fn(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def throughput(fn, texts: list) -> float:
+    start = time.perf_counter()
+    fn(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def bench_bi_encoder(name: str, posts: list, profiles: list, k: int):
+    print(f"\n{name}")
+    print(f"{'backend':<10}{'p50 ms':>9}{'p95 ms':>9}{'texts/s':>10}{'mean cos':>10}{'min cos':>10}{'top-k agree':>13}")
+    reference = None
+    for backend in model_registry.BACKENDS:
+        model = model_registry.get_sentence_transformer(name, backend=backend)
+        model.encode(profiles[:2])
+        latencies = latency_ms(lambda text: model.encode([text]), profiles)
+        rate = throughput(lambda texts: model.encode(texts, batch_size=32), posts)
+        post_vectors = normalize_rows(np.asarray(model.encode(posts, batch_size=32)))
+        profile_vectors = normalize_rows(np.asarray(model.encode(profiles, batch_size=32)))
+        retrieved = [top_k_indices(post_vectors @ query, k) for query in profile_vectors]
+        if reference is None:
+            reference = (post_vectors, profile_vectors, retrieved)
+        cosines = np.concatenate([
+            np.sum(post_vectors * reference[0], axis=1),
+            np.sum(profile_vectors * reference[1], axis=1),
+        ])
+        agreement = np.mean([len(np.intersect1d(a, b)) / k for a, b in zip(retrieved, reference[2])])
+        print(f"{backend:<10}{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+              f"{rate:>10.1f}{cosines.mean():>10.4f}{cosines.min():>10.4f}{agreement:>13.3f}")
+
+
+def bench_cross_encoder(posts: list, profiles: list):
+    pairs = [(profiles[i % len(profiles)], post) for i, post in enumerate(posts)]
+    print(f"\n{CROSS_ENCODER}")
+    print(f"{'backend':<10}{'p50 ms':>9}{'p95 ms':>9}{'pairs/s':>10}{'mean |d|':>10}{'max |d|':>10}{'spearman':>10}")
+    reference = None
+    for backend in model_registry.BACKENDS:
+        model = model_registry.get_cross_encoder(CROSS_ENCODER, backend=backend)
+        model.predict(pairs[:2])
+        latencies = latency_ms(lambda pair: model.predict([pair]), pairs[:len(profiles)])
+        rate = throughput(lambda batch: model.predict(batch, batch_size=32), pairs)
+        scores = np.asarray(model.predict(pairs, batch_size=32))
+        if reference is None:
+            reference = scores
+        difference = np.abs(scores - reference)
+        correlation = spearmanr(scores, reference).correlation
+        print(f"{backend:<10}{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+              f"{rate:>10.1f}{difference.mean():>10.4f}{difference.max():>10.4f}{correlation:>10.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="torch threads per run; 0 = torch default")
+    args = parser.parse_args()
+
+    import torch
+
+    with open("./skills-dataset/kaggle_skills.json", encoding="utf-8") as f:
+        skills = json.load(f)
+    posts, profiles = fixed_corpus(args.posts, skills)
+    print(f"{len(posts)} posts, {len(profiles)} profiles")
+
+    default_threads = torch.get_num_threads()
+    for threads in args.threads:
+        torch.set_num_threads(threads or default_threads)
+        print(f"\n==== torch threads: {torch.get_num_threads()} ====")
+        for name in BI_ENCODERS:
+            bench_bi_encoder(name, posts, profiles, args.k)
+        bench_cross_encoder(posts, profiles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Throughput of per-post lemmatization: one full-pipeline nlp() call per text vs lemmatize_many.
+
+Run from the repo root:
+    python -m benchmarks.bench_preprocess --posts 500 --n-process 1 2
+"""
+import argparse
+import json
+import random
+import time
+
+import spacy
+
+from benchmarks._corpus import synthetic_posts
+from services.text_processing import clean_text, lemma_string, lemmatize_many
+
+
+def current_path(nlp, texts):
+    # What advanced_preprocess used to do for every post
+    return [lemma_string(nlp(clean_text(text))) for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--n-process", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+
+    nlp = spacy.load("en_core_web_sm")
+    with open("./skills-dataset/kaggle_skills.json", encoding="utf-8") as f:
+        skills = json.load(f)
+    texts = synthetic_posts(args.posts, skills, random.Random(0), n_required=5)
+
+    start = time.perf_counter()
+    expected = current_path(nlp, texts)
+    baseline = time.perf_counter() - start
+    print(f"{'path':<32}{'docs/s':>10}{'speedup':>10}{'same output':>13}")
+    print(f"{'nlp(text) per post':<32}{len(texts) / baseline:>10.0f}{1.0:>10.2f}{'-':>13}")
+
+    for n_process in args.n_process:
+        for batch_size in args.batch_size:
+            start = time.perf_counter()
+            result = lemmatize_many(nlp, texts, batch_size=batch_size, n_process=n_process)
+            elapsed = time.perf_counter() - start
+            label = f"pipe batch={batch_size} procs={n_process}"
+            print(f"{label:<32}{len(texts) / elapsed:>10.0f}{baseline / elapsed:>10.2f}{str(result == expected):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Memory, scoring latency and top-k agreement of float16 / int8 embedding storage vs float32.
+
+Scores every query against the whole matrix (brute-force cosine, as the course index and
+small catalogs do). Run from the repo root:
+    python -m benchmarks.bench_quantized_store --posts 100000 --dim 768 --k 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_vector_index import clustered_vectors
+from services.quantized_store import QuantizedMatrix
+from services.vector_index import top_k_indices
+
+
+def timed_top_k(matrix: QuantizedMatrix, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(top_k_indices(matrix.cosine(query), k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.posts, args.dim, n_topics=200, rng=rng)
+    queries = clustered_vectors(args.queries, args.dim, n_topics=200, rng=rng)
+
+    reference = QuantizedMatrix.quantize(vectors, "float32")
+    reference_results, reference_ms = timed_top_k(reference, queries, args.k)
+    reference_scores = np.stack([reference.cosine(query) for query in queries[:10]])
+
+    print(f"{args.posts} vectors, dim {args.dim}, top-{args.k}")
+    print(f"{'dtype':<10}{'MB':>9}{'saved':>8}{'p50 ms':>9}{'speedup':>9}{'top-k agree':>13}{'mean |dcos|':>13}{'max |dcos|':>12}")
+    for dtype in ("float32", "float16", "int8"):
+        matrix = reference if dtype == "float32" else QuantizedMatrix.quantize(vectors, dtype)
+        results, latencies = timed_top_k(matrix, queries, args.k)
+        agreement = np.mean([len(np.intersect1d(a, b)) / args.k for a, b in zip(results, reference_results)])
+        drift = np.abs(np.stack([matrix.cosine(query) for query in queries[:10]]) - reference_scores)
+        print(f"{dtype:<10}{matrix.nbytes / 2 ** 20:>9.1f}{1 - matrix.nbytes / reference.nbytes:>8.1%}"
+              f"{np.percentile(latencies, 50):>9.2f}{np.percentile(reference_ms, 50) / np.percentile(latencies, 50):>9.2f}"
+              f"{agreement:>13.3f}{drift.mean():>13.5f}{drift.max():>12.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""spaCy PhraseMatcher (Kaggle skills) vs the Aho-Corasick SkillMatcher.
+
+Agreement is measured on the Kaggle vocabulary both matchers can hold; throughput is
+reported per MB of text, for the Kaggle and the full Kaggle + ESCO automaton. Only the
+tokenizer is needed, so a blank English pipeline stands in for en_core_web_sm.
+
+Run from the repo root:
+    python -m benchmarks.bench_skill_matcher --posts 2000
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+import spacy
+from spacy.matcher import PhraseMatcher
+
+from benchmarks._corpus import synthetic_posts
+from services.skill_matcher import SkillMatcher, normalize
+
+KAGGLE = "./skills-dataset/kaggle_skills.json"
+ESCO = "./skills-dataset/esco_skills.json"
+
+
+def keep(skills):
+    # The filter extract_skills_from_text applies to both
+    return set(s for s in skills if len(s) > 2 and not re.fullmatch(r"[a-z]", s))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(KAGGLE, encoding="utf-8") as f:
+        raw_skills = json.load(f)
+    kaggle_skills = list(set(normalize(skill) for skill in raw_skills if len(skill) > 1))
+    texts = synthetic_posts(args.posts, raw_skills, random.Random(0))
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / (1024 * 1024)
+
+    nlp = spacy.blank("en")
+    start = time.perf_counter()
+    phrase_matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+    phrase_matcher.add("SKILLS", [nlp.make_doc(skill) for skill in kaggle_skills])
+    phrase_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kaggle_matcher = SkillMatcher.build(kaggle_skills)
+    kaggle_build = time.perf_counter() - start
+    start = time.perf_counter()
+    full_matcher = SkillMatcher.from_datasets([KAGGLE, ESCO])
+    full_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = []
+    for text in texts:
+        doc = nlp.make_doc(normalize(text))
+        expected.append(keep(doc[s:e].text.lower() for _, s, e in phrase_matcher(doc)))
+    phrase_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kaggle_found = [keep(kaggle_matcher.match(text)) for text in texts]
+    kaggle_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in texts:
+        keep(full_matcher.match(text))
+    full_seconds = time.perf_counter() - start
+
+    identical = sum(a == b for a, b in zip(expected, kaggle_found))
+    jaccard = sum(len(a & b) / len(a | b) if a | b else 1.0 for a, b in zip(expected, kaggle_found)) / len(texts)
+    print(f"{len(texts)} posts, {megabytes:.2f} MB")
+    print(f"{'matcher':<30}{'skills':>9}{'build s':>10}{'MB/s':>10}")
+    print(f"{'PhraseMatcher (kaggle)':<30}{len(kaggle_skills):>9}{phrase_build:>10.2f}{megabytes / phrase_seconds:>10.2f}")
+    print(f"{'SkillMatcher (kaggle)':<30}{len(kaggle_matcher):>9}{kaggle_build:>10.2f}{megabytes / kaggle_seconds:>10.2f}")
+    print(f"{'SkillMatcher (kaggle + esco)':<30}{len(full_matcher):>9}{full_build:>10.2f}{megabytes / full_seconds:>10.2f}")
+    print(f"agreement on kaggle: identical sets {identical / len(texts):.3f}, mean jaccard {jaccard:.4f}")
+
+
+if __name__ == "__main__":
+    main()
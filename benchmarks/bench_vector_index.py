@@ -0,0 +1,67 @@
+"""Recall-vs-exact and latency of the catalog vector indexes.
+
+Run from the repo root:
+    python -m benchmarks.bench_vector_index --posts 50000 --dim 768 --k 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.vector_index import ExactIndex, IVFIndex
+
+
+def clustered_vectors(n: int, dim: int, n_topics: int, rng) -> np.ndarray:
+    # Posts cluster around topics (backend, mobile, data...), like real embeddings do
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, n)
+    vectors = topics[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors
+
+
+def timed_search(index, queries, vectors, k):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, vectors, k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=500, help="candidates returned per query")
+    parser.add_argument("--n-lists", type=int, default=0)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.posts, args.dim, n_topics=200, rng=rng)
+    queries = clustered_vectors(args.queries, args.dim, n_topics=200, rng=rng)
+
+    exact_results, exact_ms = timed_search(ExactIndex(), queries, vectors, args.k)
+    print(f"{args.posts} posts, dim {args.dim}, k={args.k}")
+    print(f"{'index':<18}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'exact':<18}{1.0:>10.3f}{np.percentile(exact_ms, 50):>10.2f}{np.percentile(exact_ms, 95):>10.2f}")
+
+    ivf = IVFIndex(n_lists=args.n_lists, min_train_size=0)
+    start = time.perf_counter()
+    ivf.train(vectors)
+    print(f"(IVF training: {time.perf_counter() - start:.1f}s, {ivf.centroids.shape[0]} lists)")
+
+    for n_probe in args.n_probe:
+        ivf.n_probe = n_probe
+        ivf_results, ivf_ms = timed_search(ivf, queries, vectors, args.k)
+        recall = np.mean([
+            len(np.intersect1d(approx, exact)) / len(exact)
+            for approx, exact in zip(ivf_results, exact_results)
+        ])
+        label = f"ivf n_probe={n_probe}"
+        print(f"{label:<18}{recall:>10.3f}{np.percentile(ivf_ms, 50):>10.2f}{np.percentile(ivf_ms, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
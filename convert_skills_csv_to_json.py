@@ -1,10 +1,20 @@
+"""Build step for the skill vocabulary.
+
+Extracts programming-language skills from the PLDB CSV (into kaggle_skills.json, as before),
+merges them with ESCO and compiles everything into the artifact directory that
+skill_extractor memory-maps at startup (see services/skill_matcher.py).
+
+    python convert_skills_csv_to_json.py --pldb-csv pldb.csv --esco-csv skills_en.csv
+
+Without --pldb-csv the existing kaggle_skills.json is reused; without --esco-csv the
+ESCO labels come from esco_skills.json (no aliases).
+"""
+import argparse
 import csv
 import json
 import re
 
-# File paths
-CSV_PATH = "D:\\careerk-ai-recommendation\\pldb.csv"
-OUTPUT_PATH = "./skills-dataset/kaggle_skills.json"
+from services.skill_matcher import SkillMatcher, fingerprint, normalize
 
 # ✅ Filter function to reject bad entries
 def is_valid_skill(skill):
@@ -28,25 +38,69 @@ def is_valid_skill(skill):
     return True
 
 # ✅ Extraction logic
-unique_skills = set()
-
-with open(CSV_PATH, mode="r", encoding="utf-8") as csvfile:
-    reader = csv.DictReader(csvfile)
-    print("📌 Available columns:", reader.fieldnames)
-
-    for row in reader:
-        title = row.get("title", "").strip()
-        if is_valid_skill(title):
-            unique_skills.add(title.lower())
-
-# ✅ Sort and save
-cleaned_skills = sorted(unique_skills)
-
-with open(OUTPUT_PATH, mode="w", encoding="utf-8") as jsonfile:
-    json.dump(cleaned_skills, jsonfile, indent=2, ensure_ascii=False)
-
-print(f"✅ Extracted {len(cleaned_skills)} clean skills to {OUTPUT_PATH}")
-
+def extract_pldb_skills(csv_path):
+    unique_skills = set()
+
+    with open(csv_path, mode="r", encoding="utf-8") as csvfile:
+        reader = csv.DictReader(csvfile)
+        print("📌 Available columns:", reader.fieldnames)
+
+        for row in reader:
+            title = row.get("title", "").strip()
+            if is_valid_skill(title):
+                unique_skills.add(title.lower())
+
+    return sorted(unique_skills)
+
+def read_esco_csv(csv_path):
+    """Preferred labels and their alternative labels from ESCO's skills_en.csv."""
+    skills, aliases = set(), {}
+    with open(csv_path, mode="r", encoding="utf-8") as csvfile:
+        for row in csv.DictReader(csvfile):
+            skill = normalize(row.get("preferredLabel", ""))
+            if len(skill) < 2:
+                continue
+            skills.add(skill)
+            for label in (row.get("altLabels") or "").split("\n"):
+                alias = normalize(label)
+                if len(alias) > 1:
+                    aliases.setdefault(alias, skill)
+    return skills, aliases
+
+def read_json_skills(path):
+    with open(path, encoding="utf-8") as f:
+        return set(normalize(skill) for skill in json.load(f) if len(skill) > 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pldb-csv", help="PLDB export; regenerates --kaggle-json from its titles")
+    parser.add_argument("--kaggle-json", default="./skills-dataset/kaggle_skills.json")
+    parser.add_argument("--esco-csv", help="ESCO skills_en.csv; adds alternative labels as aliases")
+    parser.add_argument("--esco-json", default="./skills-dataset/esco_skills.json")
+    parser.add_argument("--out", default="./skills-dataset/compiled", help="artifact directory")
+    args = parser.parse_args()
+
+    if args.pldb_csv:
+        cleaned_skills = extract_pldb_skills(args.pldb_csv)
+        with open(args.kaggle_json, mode="w", encoding="utf-8") as jsonfile:
+            json.dump(cleaned_skills, jsonfile, indent=2, ensure_ascii=False)
+        print(f"✅ Extracted {len(cleaned_skills)} clean skills to {args.kaggle_json}")
+
+    skills = read_json_skills(args.kaggle_json)
+    if args.esco_csv:
+        esco_skills, aliases = read_esco_csv(args.esco_csv)
+        sources = [args.kaggle_json, args.esco_csv]
+    else:
+        esco_skills, aliases = read_json_skills(args.esco_json), {}
+        sources = [args.kaggle_json, args.esco_json]
+    skills |= esco_skills
+
+    matcher = SkillMatcher.build(skills, aliases, source=fingerprint(sources))
+    matcher.save(args.out, inputs=sources)
+    print(f"✅ Compiled {len(matcher)} skills ({matcher.n_patterns - len(matcher)} aliases) to {args.out}")
+
+if __name__ == "__main__":
+    main()
 
 
 
@@ -1,10 +1,58 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
-from routers import cv_routes, recommender_routes, course_recommender_routes, amr_recommender
-
-app = FastAPI(title="CareerK AI Backend")
+from routers import cv_routes, recommender_routes, course_recommender_routes, amr_recommender, metrics_routes, skill_routes
+import skill_extractor
+from services import course_recommender, db, model_registry, recommender
+from services.inference_executor import InferenceOverloaded, inference_executor
+
+logger = logging.getLogger("main")
+
+# Load every model up front instead of on the first request that needs it
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0") == "1"
+
+# The job/service catalogs live in the process and each worker would flush its own copy over
+# the shared files, losing the upserts that reached the others: run a single worker
+# (uvicorn and gunicorn take their default worker count from WEB_CONCURRENCY; do not pass --workers)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WEB_CONCURRENCY > 1:
+        raise RuntimeError(f"WEB_CONCURRENCY={WEB_CONCURRENCY}: the job/service catalogs are per process, "
+                           "run a single worker (scale with INFERENCE_WORKERS threads instead)")
+    # Only the course endpoints need Postgres: start without it, db.acquire() retries on first use
+    try:
+        await db.init_pool()
+    except Exception as e:
+        logger.warning(f"Postgres pool not ready at startup, will retry on first use: {e}")
+    if MODEL_WARMUP:
+        await run_in_threadpool(model_registry.warm_up)
+    course_index_refresher = asyncio.create_task(course_recommender.refresh_course_index_periodically())
+    catalog_flusher = asyncio.create_task(amr_recommender.flush_catalogs_periodically())
+    yield
+    course_index_refresher.cancel()
+    catalog_flusher.cancel()
+    amr_recommender.flush_catalogs()
+    recommender.tfidf_store.save()
+    skill_extractor.shutdown_process_pool()
+    inference_executor.shutdown()
+    await db.close_pool()
+
+app = FastAPI(title="CareerK AI Backend", lifespan=lifespan)
+
+# Shed load when the model workers and their queue are full, rather than queueing without bound
+@app.exception_handler(InferenceOverloaded)
+async def inference_overloaded(request: Request, exc: InferenceOverloaded):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
 
 # Static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -20,9 +68,11 @@ app.add_middleware(
 
 # Include existing routers
 app.include_router(cv_routes.router, prefix="", tags=["CV Generation"])
-# app.include_router(recommender_routes.router, prefix="/recommend", tags=["Recommendation"])
+app.include_router(recommender_routes.router, prefix="/v2/recommend", tags=["Recommendation v2"])
 app.include_router(course_recommender_routes.router, prefix="/courses", tags=["ML Course Recommender"])  # ✅ NEW
 app.include_router(amr_recommender.router, prefix="/recommend", tags=["Structured Recommender"])
+app.include_router(skill_routes.router, prefix="/skills", tags=["Skill Extraction"])
+app.include_router(metrics_routes.router, prefix="/metrics", tags=["Metrics"])
 
 
 
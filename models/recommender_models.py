@@ -26,14 +26,28 @@ class RecommendationRequest(BaseModel):
     developer: DeveloperInput
     job_posts: List[JobPostInput]
     service_posts: List[ServicePostInput]
+    # Expensive stages (cross-encoder rerank) are shrunk or skipped to stay within it
+    latency_budget_ms: Optional[float] = None
 
 class ScoredItem(BaseModel):
     id: str
     score: float
 
+class StageTiming(BaseModel):
+    stage: str
+    candidates: int
+    ms: float
+    skipped: bool = False
+
+class RankingMetadata(BaseModel):
+    latency_budget_ms: Optional[float] = None
+    total_ms: float
+    stages: List[StageTiming]
+
 class RecommendationResponse(BaseModel):
     job_recommendations: List[ScoredItem]
     service_recommendations: List[ScoredItem]
+    metadata: Optional[RankingMetadata] = None
 
 
 
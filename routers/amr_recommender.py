@@ -1,23 +1,96 @@
 from fastapi import FastAPI, APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-import spacy
+from functools import lru_cache
+import asyncio
+import logging
+import os
 import re
+import json
 import numpy as np
+from services.batch_encoder import get_batch_encoder
+from services.developer_cache import developer_cache
+from services.embedding_cache import EmbeddingCache
+from services.inference_executor import InferenceOverloaded, inference_executor
+from services.post_catalog import PostCatalog
+from services.vector_index import make_index
+from services.text_processing import lemmatize, lemmatize_many
+from services.model_registry import (
+    backend_for, encoder_fingerprint, get_sentence_transformer, get_spacy, is_loaded, load_once, on_warm_up,
+)
 
 router = APIRouter()
-
-# Load spaCy
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    import spacy.cli
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
-
-bert_model = SentenceTransformer('all-mpnet-base-v2')
+logger = logging.getLogger("amr_recommender")
+
+# Models load lazily through the shared registry (one copy per process)
+BERT_MODEL_NAME = 'all-mpnet-base-v2'
+
+def get_bert_model():
+    return get_sentence_transformer(BERT_MODEL_NAME)
+
+def bert_fingerprint():
+    return encoder_fingerprint(BERT_MODEL_NAME)
+
+# Posts are encoded in one call, split into batches of this size
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "32"))
+
+# Posts are lemmatized through nlp.pipe in batches of this size (optionally multi-process)
+PREPROCESS_BATCH_SIZE = int(os.getenv("PREPROCESS_BATCH_SIZE", "256"))
+PREPROCESS_N_PROCESS = int(os.getenv("PREPROCESS_N_PROCESS", "1"))
+
+# Post embeddings survive restarts, so repeat posts skip the transformer
+post_embedding_cache = EmbeddingCache(
+    model_name=BERT_MODEL_NAME,
+    cache_dir=os.getenv("EMBEDDING_CACHE_DIR", "./cache/embeddings"),
+    memory_size=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000")),
+    disk_size=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000")),
+    backend=backend_for(BERT_MODEL_NAME),
+    fingerprint=bert_fingerprint,
+)
+
+# Posts ingested through the catalog endpoints, scored without re-sending them
+CATALOG_DIR = os.getenv("CATALOG_DIR", "./catalog")
+# Catalog embedding storage: "float32", "float16" (half the memory) or "int8" (a quarter)
+CATALOG_VECTOR_DTYPE = os.getenv("CATALOG_VECTOR_DTYPE", "float32")
+# Catalog files are rewritten at most this often (they are also flushed on shutdown)
+CATALOG_SAVE_SECONDS = float(os.getenv("CATALOG_SAVE_SECONDS", "30"))
+
+# Candidate retrieval for the catalog: "ivf" (approximate) or "exact".
+# IVF kicks in once a catalog reaches ANN_MIN_POSTS; below that it is brute force.
+ANN_INDEX = os.getenv("ANN_INDEX", "ivf")
+ANN_MIN_POSTS = int(os.getenv("ANN_MIN_POSTS", "5000"))
+ANN_CANDIDATES = int(os.getenv("ANN_CANDIDATES", "500"))
+IVF_N_LISTS = int(os.getenv("IVF_N_LISTS", "0"))  # 0 = sqrt(catalog size)
+IVF_N_PROBE = int(os.getenv("IVF_N_PROBE", "16"))
+
+# Skill string -> lemma tuple memo; the optional table is prefilled from the skill datasets
+SKILL_TOKEN_CACHE_SIZE = int(os.getenv("SKILL_TOKEN_CACHE_SIZE", "50000"))
+SKILL_LEMMA_TABLE = os.getenv("SKILL_LEMMA_TABLE", "0") == "1"
+SKILL_DATASETS = ["./skills-dataset/kaggle_skills.json", "./skills-dataset/esco_skills.json"]
+
+def make_catalog_index():
+    if ANN_INDEX == "ivf":
+        return make_index("ivf", n_lists=IVF_N_LISTS, n_probe=IVF_N_PROBE, min_train_size=ANN_MIN_POSTS)
+    return make_index(ANN_INDEX)
+
+# Posts encoded under another model, backend or encoding settings are not comparable with today's developer vectors.
+# Per-process state: main.py refuses to start more than one worker.
+job_catalog = PostCatalog("jobs", CATALOG_DIR, index=make_catalog_index(), dtype=CATALOG_VECTOR_DTYPE,
+                          save_interval=CATALOG_SAVE_SECONDS, fingerprint=bert_fingerprint)
+service_catalog = PostCatalog("services", CATALOG_DIR, index=make_catalog_index(), dtype=CATALOG_VECTOR_DTYPE,
+                              save_interval=CATALOG_SAVE_SECONDS, fingerprint=bert_fingerprint)
+
+def flush_catalogs():
+    job_catalog.flush()
+    service_catalog.flush()
+
+async def flush_catalogs_periodically():
+    while True:
+        await asyncio.sleep(max(CATALOG_SAVE_SECONDS, 1))
+        try:
+            await asyncio.to_thread(flush_catalogs)
+        except Exception as e:
+            logger.error(f"Catalog save failed: {e}")
 
 # ==== Data Models ====
 class DeveloperInput(BaseModel):
@@ -57,16 +130,21 @@ class RecommendationResponse(BaseModel):
     job_recommendations: List[ScoredItem]
     service_recommendations: List[ScoredItem]
 
+class CatalogRecommendationRequest(BaseModel):
+    developer: DeveloperInput
+    top_k: int = Field(20, ge=1)
+
+class CatalogUpdateResponse(BaseModel):
+    changed: int
+    total: int
+
 
 # ==== Utility Functions ====
 def advanced_preprocess(text: str) -> str:
-    text = re.sub(r'[^\w\s]', ' ', text.lower())
-    doc = nlp(text)
-    tokens = [
-        token.lemma_ for token in doc
-        if not token.is_stop and len(token) > 2 and not token.is_digit
-    ]
-    return " ".join(tokens)
+    return lemmatize(get_spacy(), text)
+
+def advanced_preprocess_many(texts: List[str]) -> List[str]:
+    return lemmatize_many(get_spacy(), texts, batch_size=PREPROCESS_BATCH_SIZE, n_process=PREPROCESS_N_PROCESS)
 
 def parse_experience(text: str) -> tuple[int, int]:
     text = text.lower()
@@ -99,15 +177,67 @@ def calculate_experience_score(dev_exp: int, job_min_exp: int) -> float:
     else:
         return round(dev_exp / job_min_exp, 2)
 
-def skill_score_calculator(dev_tokens: set, required_skills: List[str]) -> float:
-    if not required_skills:
+@lru_cache(maxsize=SKILL_TOKEN_CACHE_SIZE)
+def lemmatize_skill(skill: str) -> tuple:
+    return tuple(advanced_preprocess(skill).split())
+
+def skill_tokens(skill: str) -> tuple:
+    # advanced_preprocess lowercases first, so case/whitespace variants share one entry
+    key = skill.strip().lower()
+    tokens = get_skill_lemma_table().get(key)
+    if tokens is None:
+        tokens = lemmatize_skill(key)
+    return tokens
+
+def build_skill_lemma_table(paths: List[str]) -> dict:
+    table = {}
+    skills = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            skills.update(skill.strip().lower() for skill in json.load(f))
+    skills = sorted(skills)
+    for skill, processed in zip(skills, advanced_preprocess_many(skills)):
+        table[skill] = tuple(processed.split())
+    return table
+
+def get_skill_lemma_table() -> dict:
+    if not SKILL_LEMMA_TABLE:
+        return {}
+    return load_once("skill_lemma_table", lambda: build_skill_lemma_table(SKILL_DATASETS))
+
+@on_warm_up
+def warm_up_structured_recommender():
+    get_spacy()
+    get_bert_model()
+    get_skill_lemma_table()
+
+def skill_token_score(dev_tokens: set, skills_tokens: List[tuple]) -> float:
+    if not skills_tokens:
         return 0.0
     matched = 0
-    for skill in required_skills:
-        tokens = advanced_preprocess(skill).split()
+    for tokens in skills_tokens:
         if all(t in dev_tokens for t in tokens):
             matched += 1
-    return matched / len(required_skills)
+    return matched / len(skills_tokens)
+
+def skill_score_calculator(dev_tokens: set, required_skills: List[str]) -> float:
+    return skill_token_score(dev_tokens, [skill_tokens(skill) for skill in required_skills])
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    if not texts:
+        return np.empty((0, get_bert_model().get_sentence_embedding_dimension()), dtype=np.float32)
+    # Shares model calls with concurrent requests
+    return get_batch_encoder(BERT_MODEL_NAME, encode_batch_size=ENCODE_BATCH_SIZE).encode(texts)
+
+def cosine_scores(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    # Same as sklearn's cosine_similarity([query], matrix)[0], clipped to [0, 1]
+    if matrix.shape[0] == 0:
+        return np.empty(0, dtype=np.float32)
+    query_norm = np.linalg.norm(query) or 1.0
+    row_norms = np.linalg.norm(matrix, axis=1)
+    row_norms[row_norms == 0] = 1.0
+    similarities = (matrix @ query) / (row_norms * query_norm)
+    return np.clip(similarities, 0.0, 1.0)
 
 def get_valid_cv_text(dev: DeveloperInput) -> str:
     parts = []
@@ -125,75 +255,208 @@ def get_valid_cv_text(dev: DeveloperInput) -> str:
         parts.append(" ".join(dev.skills))
     return " ".join([p for p in parts if p])
 
+def job_text(job: JobPostInput) -> str:
+    return f"{job.title} {' '.join(job.skills or [])} {job.job_description}"
+
+def service_text(sp: ServicePostInput) -> str:
+    return f"{sp.title} {sp.description} {' '.join(sp.required_skills or [])}"
+
+def prepare_developer(dev: DeveloperInput):
+    cv_text = get_valid_cv_text(dev)
+    if not cv_text:
+        raise HTTPException(400, "cv_text and fallback fields are empty")
+
+    def encode_profile():
+        processed_cv = advanced_preprocess(cv_text)
+        # A copy, not a row view: the cached vector must not keep the whole batch array alive
+        cv_vector = np.array(encode_texts([processed_cv])[0], dtype=np.float32, copy=True)
+        return cv_vector, frozenset(processed_cv.split())
+
+    # Keyed by developer id + hash of cv_text: repeat requests skip spaCy and the transformer
+    cv_vector, cv_tokens = developer_cache.get_or_compute("structured", dev.id, cv_text, encode_profile)
+    dev_exp = dev.years_of_experience or 0
+    return cv_vector, cv_tokens, dev_exp
+
+def score_job(job_id: str, similarity: float, dev_exp: int, job_min_exp: int,
+              cv_tokens: set, skills_tokens: List[tuple]) -> ScoredItem:
+    similarity = float(similarity)
+    experience_score = calculate_experience_score(dev_exp, job_min_exp)
+    skill_score = skill_token_score(cv_tokens, skills_tokens)
+    final_score = (0.65 * similarity) + (0.15 * experience_score) + (0.2 * skill_score)
+
+    return ScoredItem(
+        id=job_id,
+        final_score=round(final_score, 4),
+        similarity_score=round(similarity, 4),
+        experience_score=round(experience_score, 4),
+        skill_score=round(skill_score, 4)
+    )
+
+def score_service(sp_id: str, similarity: float, cv_tokens: set, skills_tokens: List[tuple]) -> ScoredItem:
+    similarity = float(similarity)
+    skill_score = skill_token_score(cv_tokens, skills_tokens)
+    final_score = (0.5 * similarity) + (0.5 * skill_score)
+
+    return ScoredItem(
+        id=sp_id,
+        final_score=round(final_score, 4),
+        similarity_score=round(similarity, 4),
+        skill_score=round(skill_score, 4)
+    )
+
+def rank_results(results: List[ScoredItem], top_k: Optional[int] = None) -> List[ScoredItem]:
+    results = [r for r in results if r.final_score >= 0.4]
+    results.sort(key=lambda x: x.final_score, reverse=True)
+    return results[:top_k] if top_k is not None else results
+
 # ==== Main Endpoint ====
+def recommend_posts(payload: RecommendationRequest) -> RecommendationResponse:
+    cv_vector, cv_tokens, dev_exp = prepare_developer(payload.developer)
+
+    # Preprocess every post first, then encode them all in one batched call
+    post_texts = advanced_preprocess_many(
+        [job_text(job) for job in payload.job_posts] + [service_text(sp) for sp in payload.service_posts]
+    )
+    job_texts = post_texts[:len(payload.job_posts)]
+    sp_texts = post_texts[len(payload.job_posts):]
+    post_vectors = post_embedding_cache.encode(job_texts + sp_texts, encode_texts)
+    job_similarities = cosine_scores(cv_vector, post_vectors[:len(job_texts)])
+    sp_similarities = cosine_scores(cv_vector, post_vectors[len(job_texts):])
+
+    # ==== JOBS ====
+    job_results = []
+    for job, similarity in zip(payload.job_posts, job_similarities):
+        job_min_exp, _ = parse_experience(job.job_description or "")
+        skills_tokens = [skill_tokens(skill) for skill in job.skills or []]
+        job_results.append(score_job(job.id, similarity, dev_exp, job_min_exp, cv_tokens, skills_tokens))
+
+    # ==== SERVICES ====
+    service_results = []
+    for sp, similarity in zip(payload.service_posts, sp_similarities):
+        skills_tokens = [skill_tokens(skill) for skill in sp.required_skills or []]
+        service_results.append(score_service(sp.id, similarity, cv_tokens, skills_tokens))
+
+    return RecommendationResponse(
+        job_recommendations=rank_results(job_results),
+        service_recommendations=rank_results(service_results)
+    )
+
 @router.post("/", response_model=RecommendationResponse)
 async def recommend(payload: RecommendationRequest):
     try:
-        dev = payload.developer
-        cv_text = get_valid_cv_text(dev)
-
-        if not cv_text:
-            raise HTTPException(400, "cv_text and fallback fields are empty")
-
-        processed_cv = advanced_preprocess(cv_text)
-        cv_vector = np.array(bert_model.encode(processed_cv))
-        cv_tokens = set(processed_cv.split())
-
-        dev_exp = dev.years_of_experience or 0
-
-        # ==== JOBS ====
-        job_results = []
-        for job in payload.job_posts:
-            job_text = advanced_preprocess(f"{job.title} {' '.join(job.skills or [])} {job.job_description}")
-            job_vector = np.array(bert_model.encode(job_text))
-            similarity = cosine_similarity([cv_vector], [job_vector])[0][0]
-            similarity = max(0.0, min(1.0, similarity))
-
-            job_min_exp, _ = parse_experience(job.job_description or "")
-            experience_score = calculate_experience_score(dev_exp, job_min_exp)
-
-            skill_score = skill_score_calculator(cv_tokens, job.skills or [])
-            final_score = (0.65 * similarity) + (0.15 * experience_score) + (0.2 * skill_score)
-
-            job_results.append(ScoredItem(
-                id=job.id,
-                final_score=round(final_score, 4),
-                similarity_score=round(similarity, 4),
-                experience_score=round(experience_score, 4),
-                skill_score=round(skill_score, 4)
-            ))
-
-        job_results = [j for j in job_results if j.final_score >= 0.4]
-        job_results.sort(key=lambda x: x.final_score, reverse=True)
-
-        # ==== SERVICES ====
-        service_results = []
-        for sp in payload.service_posts:
-            sp_text = advanced_preprocess(f"{sp.title} {sp.description} {' '.join(sp.required_skills or [])}")
-            sp_vector = np.array(bert_model.encode(sp_text))
-            similarity = cosine_similarity([cv_vector], [sp_vector])[0][0]
-            similarity = max(0.0, min(1.0, similarity))
-
-            skill_score = skill_score_calculator(cv_tokens, sp.required_skills or [])
-            final_score = (0.5 * similarity) + (0.5 * skill_score)
-
-            service_results.append(ScoredItem(
-                id=sp.id,
-                final_score=round(final_score, 4),
-                similarity_score=round(similarity, 4),
-                skill_score=round(skill_score, 4)
-            ))
-
-        service_results = [s for s in service_results if s.final_score >= 0.4]
-        service_results.sort(key=lambda x: x.final_score, reverse=True)
-
-        return RecommendationResponse(
-            job_recommendations=job_results,
-            service_recommendations=service_results
-        )
+        # spaCy and the transformer are CPU-bound: run them on the bounded inference pool
+        return await inference_executor.run(recommend_posts, payload)
+    except (HTTPException, InferenceOverloaded):
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Recommendation error: {str(e)}")
-
+        raise HTTPException(status_code=500, detail=f"Recommendation error: {str(e)}")
+
+@router.get("/cache/stats")
+def embedding_cache_stats():
+    skill_cache = lemmatize_skill.cache_info()
+    return {
+        "post_embeddings": post_embedding_cache.stats(),
+        "developers": developer_cache.stats(),
+        "skill_tokens": {
+            "hits": skill_cache.hits,
+            "misses": skill_cache.misses,
+            "entries": skill_cache.currsize,
+            "max_entries": skill_cache.maxsize,
+            "lemma_table_entries": len(get_skill_lemma_table()) if is_loaded("skill_lemma_table") else 0,
+        },
+    }
+
+# ==== Post Catalog ====
+def ingest_jobs(jobs: List[JobPostInput]):
+    vectors = post_embedding_cache.encode(advanced_preprocess_many([job_text(job) for job in jobs]), encode_texts)
+    job_catalog.upsert(
+        ids=[job.id for job in jobs],
+        vectors=vectors,
+        skill_tokens=[[skill_tokens(skill) for skill in job.skills or []] for job in jobs],
+        experience=[parse_experience(job.job_description or "") for job in jobs],
+    )
+
+def ingest_services(services: List[ServicePostInput]):
+    vectors = post_embedding_cache.encode(advanced_preprocess_many([service_text(sp) for sp in services]), encode_texts)
+    service_catalog.upsert(
+        ids=[sp.id for sp in services],
+        vectors=vectors,
+        skill_tokens=[[skill_tokens(skill) for skill in sp.required_skills or []] for sp in services],
+        experience=[(0, 0)] * len(services),
+    )
+
+@router.delete("/cache/developers/{developer_id}")
+def invalidate_developer(developer_id: str):
+    # Shared with the course recommender: drops every cached encoding of this developer
+    return {"invalidated": developer_cache.invalidate(developer_id)}
+
+@router.delete("/cache/developers")
+def clear_developer_cache():
+    return {"invalidated": developer_cache.clear()}
+
+@router.put("/catalog/jobs", response_model=CatalogUpdateResponse)
+async def upsert_job_posts(jobs: List[JobPostInput]):
+    if jobs:
+        # Encoding shares the bounded inference pool (and its 503 on overload) with the recommend endpoints
+        await inference_executor.run(ingest_jobs, jobs)
+    return CatalogUpdateResponse(changed=len(jobs), total=len(job_catalog))
+
+@router.delete("/catalog/jobs/{post_id}", response_model=CatalogUpdateResponse)
+def delete_job_post(post_id: str):
+    deleted = job_catalog.delete([post_id])
+    if not deleted:
+        raise HTTPException(404, f"Job post {post_id} is not in the catalog")
+    return CatalogUpdateResponse(changed=deleted, total=len(job_catalog))
+
+@router.put("/catalog/services", response_model=CatalogUpdateResponse)
+async def upsert_service_posts(services: List[ServicePostInput]):
+    if services:
+        # Encoding shares the bounded inference pool (and its 503 on overload) with the recommend endpoints
+        await inference_executor.run(ingest_services, services)
+    return CatalogUpdateResponse(changed=len(services), total=len(service_catalog))
+
+@router.delete("/catalog/services/{post_id}", response_model=CatalogUpdateResponse)
+def delete_service_post(post_id: str):
+    deleted = service_catalog.delete([post_id])
+    if not deleted:
+        raise HTTPException(404, f"Service post {post_id} is not in the catalog")
+    return CatalogUpdateResponse(changed=deleted, total=len(service_catalog))
+
+def recommend_catalog_posts(payload: CatalogRecommendationRequest) -> RecommendationResponse:
+    cv_vector, cv_tokens, dev_exp = prepare_developer(payload.developer)
+    # The vector index picks candidates by similarity; experience and skills refine them
+    n_candidates = max(ANN_CANDIDATES, 10 * payload.top_k)
+
+    # ==== JOBS ====
+    job_results = []
+    # Cosines against the stored (possibly quantized) vectors, clipped to [0, 1] like cosine_scores
+    ids, similarities, skills_tokens, experience = job_catalog.search(cv_vector, n_candidates)
+    if ids:
+        similarities = np.clip(similarities / (np.linalg.norm(cv_vector) or 1.0), 0.0, 1.0)
+        for job_id, similarity, job_skills, (job_min_exp, _) in zip(ids, similarities, skills_tokens, experience):
+            job_results.append(score_job(job_id, similarity, dev_exp, job_min_exp, cv_tokens, job_skills))
+
+    # ==== SERVICES ====
+    service_results = []
+    ids, similarities, skills_tokens, _ = service_catalog.search(cv_vector, n_candidates)
+    if ids:
+        similarities = np.clip(similarities / (np.linalg.norm(cv_vector) or 1.0), 0.0, 1.0)
+        for sp_id, similarity, sp_skills in zip(ids, similarities, skills_tokens):
+            service_results.append(score_service(sp_id, similarity, cv_tokens, sp_skills))
+
+    return RecommendationResponse(
+        job_recommendations=rank_results(job_results, payload.top_k),
+        service_recommendations=rank_results(service_results, payload.top_k)
+    )
+
+@router.post("/catalog", response_model=RecommendationResponse)
+async def recommend_from_catalog(payload: CatalogRecommendationRequest):
+    try:
+        return await inference_executor.run(recommend_catalog_posts, payload)
+    except (HTTPException, InferenceOverloaded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Recommendation error: {str(e)}")
 
 
 # from fastapi import FastAPI, APIRouter, HTTPException
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
-from services.course_recommender import get_course_recommendations
+from services.course_recommender import course_index, get_course_recommendations, refresh_course_index
+from services.inference_executor import InferenceOverloaded
 
 router = APIRouter()
 
@@ -8,5 +9,18 @@ async def recommend_courses(developer_id: str):
     try:
         recommendations = await get_course_recommendations(developer_id)
         return recommendations
+    except InferenceOverloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/index")
+def course_index_stats():
+    return course_index.stats()
+
+@router.post("/index/refresh")
+async def refresh_courses(full: bool = False):
+    try:
+        return await refresh_course_index(full=full)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
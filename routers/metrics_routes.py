@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from services import batch_encoder, db, model_registry
+from services.inference_executor import inference_executor
+
+router = APIRouter()
+
+@router.get("/models")
+def model_stats():
+    return model_registry.stats()
+
+@router.get("/db")
+def db_pool_stats():
+    return db.pool_stats()
+
+@router.get("/inference")
+def inference_stats():
+    return inference_executor.stats()
+
+@router.get("/batching")
+def batching_stats():
+    return batch_encoder.stats()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from models.recommender_models import RecommendationRequest, RecommendationResponse
-from services.recommender import recommend_for_developer
+from services.inference_executor import InferenceOverloaded, inference_executor
+from services.recommender import post_embedding_cache, recommend_for_developer, tfidf_store
 import logging
 import traceback
 
@@ -8,22 +9,34 @@ logger = logging.getLogger("CareerK-Recommender")
 router = APIRouter()
 
 @router.post("", response_model=RecommendationResponse)
-def recommend(data: RecommendationRequest):
+async def recommend(data: RecommendationRequest):
     try:
         logger.info(f"Received request for developer ID: {data.developer.id}")
         logger.info(f"{len(data.job_posts)} job posts | {len(data.service_posts)} service posts")
 
-        result = recommend_for_developer(
+        # Encoders and the cross-encoder are CPU-bound: keep them off the event loop
+        result = await inference_executor.run(
+            recommend_for_developer,
             developer=data.developer.dict(),
             job_posts=[job.dict() for job in data.job_posts],
-            service_posts=[srv.dict() for srv in data.service_posts]
+            service_posts=[srv.dict() for srv in data.service_posts],
+            latency_budget_ms=data.latency_budget_ms,
         )
         return result
+    except InferenceOverloaded:
+        raise
     except Exception as e:
         logger.error("🔥 Recommendation failed!")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Recommendation failed: {str(e)}")
 
+@router.get("/cache/stats")
+def recommender_cache_stats():
+    return {
+        "post_embeddings": post_embedding_cache.stats(),
+        "post_tfidf": tfidf_store.stats(),
+    }
+
 
 
 
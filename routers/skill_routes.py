@@ -0,0 +1,135 @@
+import asyncio
+import json
+from collections import deque
+
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from skill_extractor import SKILL_BATCH_CHUNK_SIZE, SKILL_BATCH_WORKERS, extract_skills_chunk, get_process_pool
+
+router = APIRouter()
+
+
+async def read_ndjson(request: Request):
+    """JSON values of an NDJSON request body, parsed as the body streams in."""
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def parse_document(line: bytes, position: int):
+    document = json.loads(line)
+    if isinstance(document, str):
+        return position, document
+    if not isinstance(document, dict):
+        raise ValueError("expected a JSON string or object")
+    text = document.get("text") or ""
+    if not isinstance(text, str):
+        raise ValueError("text must be a string")
+    return document.get("id", position), text
+
+
+async def extract_chunk(chunk):
+    ids = [doc_id for doc_id, _ in chunk]
+    texts = [text for _, text in chunk]
+    executor = get_process_pool()
+    if executor is None:
+        skills = await run_in_threadpool(extract_skills_chunk, texts)
+    else:
+        skills = await asyncio.get_running_loop().run_in_executor(executor, extract_skills_chunk, texts)
+    return [json.dumps({"id": doc_id, "skills": found}) + "\n" for doc_id, found in zip(ids, skills)]
+
+
+async def drain(pending: deque):
+    item = pending.popleft()
+    return await item if isinstance(item, asyncio.Future) else item
+
+
+async def extract_ndjson(lines):
+    """Output lines for NDJSON input `lines`, in input order, with bounded work and memory in flight."""
+    max_in_flight = max(SKILL_BATCH_WORKERS, 1)
+    # Extraction tasks, or already-rendered error lines; error lines count too, so a run of
+    # bad lines behind a slow chunk cannot pile up
+    pending = deque()
+    in_flight = 0
+    chunk = []
+    position = 0
+    async for line in lines:
+        try:
+            chunk.append(parse_document(line, position))
+        except ValueError as e:
+            if chunk:
+                pending.append(asyncio.ensure_future(extract_chunk(chunk)))
+                in_flight += 1
+                chunk = []
+            pending.append([json.dumps({"id": position, "error": str(e)}) + "\n"])
+        position += 1
+        if len(chunk) >= SKILL_BATCH_CHUNK_SIZE:
+            pending.append(asyncio.ensure_future(extract_chunk(chunk)))
+            in_flight += 1
+            chunk = []
+        while pending and (in_flight >= max_in_flight or len(pending) > SKILL_BATCH_CHUNK_SIZE
+                           or not isinstance(pending[0], asyncio.Future)):
+            in_flight -= isinstance(pending[0], asyncio.Future)
+            for out in await drain(pending):
+                yield out
+    if chunk:
+        pending.append(asyncio.ensure_future(extract_chunk(chunk)))
+    while pending:
+        for out in await drain(pending):
+            yield out
+
+
+class ExtractSkillsEndpoint:
+    """Skills of many CVs: NDJSON in, NDJSON out, in input order.
+
+    Each request line is a JSON string or `{"id": ..., "text": ...}`; each response line is
+    `{"id": ..., "skills": [...]}` (id defaults to the line number), or `{"id": ..., "error": ...}`
+    for a line that is not a valid document. Lines are processed in chunks as they arrive, with
+    at most one chunk per worker in flight, so memory does not grow with the input.
+
+    A plain ASGI app rather than a route function, since the response streams while the
+    request body is still being read: StreamingResponse listens for a disconnect on
+    receive(), which would swallow the body messages. Until the body is read, only the
+    reader calls the server's receive() (it raises ClientDisconnect on a disconnect); the
+    response's listener waits for that and only then takes over.
+    """
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        body_done = asyncio.Event()
+        disconnected = False
+
+        async def lines():
+            try:
+                async for line in read_ndjson(request):
+                    yield line
+            finally:
+                body_done.set()
+
+        async def results():
+            nonlocal disconnected
+            try:
+                async for out in extract_ndjson(lines()):
+                    yield out
+            except ClientDisconnect:
+                disconnected = True
+
+        async def receive_after_body():
+            await body_done.wait()
+            if disconnected:
+                return {"type": "http.disconnect"}
+            return await receive()
+
+        response = StreamingResponse(results(), media_type="application/x-ndjson")
+        await response(scope, receive_after_body, send)
+
+
+router.add_route("/extract", ExtractSkillsEndpoint(), methods=["POST"])
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from services import encoding
+from services.model_registry import get_sentence_transformer
+
+logger = logging.getLogger("batch_encoder")
+
+# A batch closes when it holds this many texts, or this long after its first call was submitted
+ENCODE_BATCH_MAX_SIZE = int(os.getenv("ENCODE_BATCH_MAX_SIZE", "32"))
+ENCODE_BATCH_MAX_WAIT_MS = float(os.getenv("ENCODE_BATCH_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250]
+
+
+class _Request:
+    __slots__ = ("texts", "future", "submitted")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+def _histogram(buckets: List[float]) -> Dict[str, int]:
+    return {**{f"<={bound}": 0 for bound in buckets}, f">{buckets[-1]}": 0}
+
+
+def _observe(histogram: Dict[str, int], buckets: List[float], value: float):
+    for bound in buckets:
+        if value <= bound:
+            histogram[f"<={bound}"] += 1
+            return
+    histogram[f">{buckets[-1]}"] += 1
+
+
+class BatchEncoder:
+    """Collects encode calls from concurrent requests into one model call.
+
+    Callers (request threads, or coroutines through encode_async) submit their texts and
+    get a future. A single worker thread takes the first waiting call, keeps collecting
+    until the batch holds `max_batch_size` texts or `max_wait_ms` have passed since that
+    call was submitted, runs `encode_fn` once on everything, and hands each caller its rows.
+    A call larger than the batch limit runs on its own; the model batches it internally.
+    """
+
+    def __init__(self, name: str, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.name = name
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.calls = 0
+        self.texts = 0
+        self.batch_sizes = _histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms = _histogram(WAIT_MS_BUCKETS)
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"batch-encoder-{self.name}", daemon=True)
+                    self._thread.start()
+
+    # ==== Callers ====
+    def submit(self, texts: List[str]) -> Future:
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return request.future
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    # ==== Worker ====
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = batch[0].submitted + self.max_wait_ms / 1000
+            while size < self.max_batch_size:
+                # Calls already waiting always join, even once the deadline has passed
+                timeout = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._process(batch)
+
+    def _process(self, batch: List[_Request]):
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+        with self._stats_lock:
+            self.batches += 1
+            self.calls += len(batch)
+            self.texts += len(texts)
+            _observe(self.batch_sizes, BATCH_SIZE_BUCKETS, len(texts))
+            for request in batch:
+                _observe(self.wait_ms, WAIT_MS_BUCKETS, (started - request.submitted) * 1000)
+
+        try:
+            vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Batch of {len(texts)} texts failed on {self.name}: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": self.batches,
+                "calls": self.calls,
+                "texts": self.texts,
+                "calls_per_batch": round(self.calls / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": dict(self.batch_sizes),
+                "wait_ms_histogram": dict(self.wait_ms),
+                "queued": self._queue.qsize(),
+            }
+
+
+_encoders: Dict[str, BatchEncoder] = {}
+_encoders_lock = threading.Lock()
+
+
+def get_batch_encoder(model_name: str, encode_batch_size: int = 32) -> BatchEncoder:
+    """The shared batcher of a sentence-transformers model; every module encoding with it joins the same batches.
+
+    Vectors come back unnormalized; each merged batch is encoded through
+    services.encoding (length buckets, long texts split into passages). `encode_batch_size`
+    caps the texts per model call and is fixed by the first caller.
+    """
+    with _encoders_lock:
+        encoder = _encoders.get(model_name)
+        if encoder is None:
+            def encode(texts: List[str]) -> np.ndarray:
+                return encoding.encode_texts(get_sentence_transformer(model_name), texts, batch_size=encode_batch_size)
+
+            encoder = BatchEncoder(model_name, encode, ENCODE_BATCH_MAX_SIZE, ENCODE_BATCH_MAX_WAIT_MS)
+            _encoders[model_name] = encoder
+        return encoder
+
+
+def stats() -> dict:
+    with _encoders_lock:
+        return {name: encoder.stats() for name, encoder in _encoders.items()}
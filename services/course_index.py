@@ -0,0 +1,301 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from services.quantized_store import QuantizedMatrix
+
+logger = logging.getLogger("course_index")
+
+COURSE_FILTER = "name IS NOT NULL AND description IS NOT NULL"
+
+# Contents and reviews are aggregated separately and then joined: joining both to courses
+# before one GROUP BY would multiply every content row by every review of the course
+STATS_QUERY = """
+    SELECT
+        c.id,
+        COALESCE(cc.total_video_minutes, 0) AS total_video_minutes,
+        COALESCE(cc.total_lessons, 0) AS total_lessons,
+        cr.average_rating
+    FROM courses c
+    LEFT JOIN (
+        SELECT
+            course_id,
+            SUM(video_time_minutes) FILTER (WHERE type = 'video') AS total_video_minutes,
+            COUNT(*) FILTER (WHERE type IN ('video', 'quiz')) AS total_lessons
+        FROM course_contents
+        GROUP BY course_id
+    ) cc ON cc.course_id = c.id
+    LEFT JOIN (
+        SELECT course_id, ROUND(AVG(rating)::numeric, 1) AS average_rating
+        FROM course_reviews
+        GROUP BY course_id
+    ) cr ON cr.course_id = c.id
+    WHERE c.name IS NOT NULL AND c.description IS NOT NULL
+"""
+
+# Same stats from the materialized view in sql/course_stats.sql
+STATS_VIEW_REFRESH = "REFRESH MATERIALIZED VIEW CONCURRENTLY course_stats"
+STATS_VIEW_QUERY = """
+    SELECT course_id AS id, total_video_minutes, total_lessons, average_rating
+    FROM course_stats
+"""
+
+
+# Words, keeping the + and # of names like c++ / c#
+TOKEN_PATTERN = re.compile(r"\w[\w+#]*")
+
+
+class KeywordIndex:
+    """Inverted index word -> course positions, for counting developer keywords per course.
+
+    A keyword counts for a course when all its words occur in the course text as whole
+    words; keywords that are more than their words (several words, or punctuation as in
+    .net or node.js) are then confirmed verbatim on those few candidates.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.texts = [text.lower() for text in texts]
+        postings = defaultdict(list)
+        for i, text in enumerate(self.texts):
+            for token in set(TOKEN_PATTERN.findall(text)):
+                postings[token].append(i)
+        self.postings = {token: np.array(rows, dtype=np.int32) for token, rows in postings.items()}
+
+    def count_matches(self, keywords: List[str]) -> np.ndarray:
+        counts = np.zeros(len(self.texts), dtype=np.int32)
+        for keyword in keywords:
+            keyword = keyword.lower().strip()
+            tokens = TOKEN_PATTERN.findall(keyword)
+            if not tokens:
+                continue
+            rows = self.postings.get(tokens[0])
+            for token in tokens[1:]:
+                if rows is None or not rows.size:
+                    break
+                rows = np.intersect1d(rows, self.postings.get(token, rows[:0]), assume_unique=True)
+            if rows is None or not rows.size:
+                continue
+            if "".join(tokens) != keyword:
+                rows = rows[[keyword in self.texts[row] for row in rows]]
+            counts[rows] += 1
+        return counts
+
+
+class CourseIndex:
+    """Course embeddings and aggregate stats, kept between requests and restarts.
+
+    refresh() only fetches courses whose `updated_at` moved past the stored watermark
+    (or every course with full=True, or when the table has no such column) and re-encodes
+    those whose text changed, drops deleted courses and reloads the cheap per-course stats
+    (duration, lessons, rating), which change with contents and reviews.
+    Stored as `vectors.npy` (+ `norms.npy`, `scales.npy`) + `meta.json` under `directory`;
+    vectors are L2-normalized and kept as `dtype` (float32, float16 or int8, see
+    services.quantized_store), so scoring a developer is a single product with the stored
+    matrix. The keyword index is rebuilt from the course texts whenever the courses change.
+    With `stats_view`, stats come from the course_stats materialized view
+    (sql/course_stats.sql), refreshed first. The encoder `fingerprint()`
+    (services.model_registry.encoder_fingerprint) is stored with the index; when it
+    differs (or was not stored), the next refresh re-encodes every course.
+    """
+
+    def __init__(self, directory: str, encode: Callable[[List[str]], np.ndarray],
+                 updated_at_column: str = "updated_at", dtype: str = "float32", stats_view: bool = False,
+                 fingerprint: Optional[Callable[[], str]] = None):
+        self.directory = directory
+        self.get_fingerprint = fingerprint
+        # Fingerprint of the stored vectors
+        self.fingerprint: Optional[str] = None
+        self.encode = encode
+        self.updated_at_column = updated_at_column
+        self.dtype = dtype
+        self.stats_view = stats_view
+        # (courses, vectors, keywords) swapped as one object, so readers never see a half-applied refresh
+        self._data = ([], None, KeywordIndex([]))
+        self.watermark: Optional[datetime] = None
+        self.last_refresh: Optional[datetime] = None
+        # Whether courses has the updated_at column; checked on the first refresh
+        self._has_updated_at: Optional[bool] = None
+        self._refresh_lock = asyncio.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._data[0])
+
+    @property
+    def courses(self) -> List[dict]:
+        return self._data[0]
+
+    @property
+    def vectors(self) -> Optional[QuantizedMatrix]:
+        return self._data[1]
+
+    # ==== Persistence ====
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.fingerprint = meta.get("fingerprint")
+        courses = meta["courses"]
+        self.watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        self._data = (
+            courses,
+            QuantizedMatrix.load(self.directory, self.dtype) if courses else None,
+            KeywordIndex([course["text"] for course in courses]),
+        )
+        logger.info(f"Loaded {len(self.courses)} indexed courses from {self.directory}")
+
+    def _save(self, watermark: Optional[datetime], fingerprint: Optional[str]):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.save(self.directory)
+        with open(self._meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "courses": self.courses,
+                "watermark": watermark.isoformat() if watermark else None,
+            }, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+
+    # ==== Refresh ====
+    async def refresh(self, acquire: Callable, full: bool = False) -> dict:
+        """`acquire()` gives a connection context (services.db.acquire); it is only held for the queries."""
+        async with self._refresh_lock:
+            return await self._refresh(acquire, full)
+
+    async def build_if_empty(self, acquire: Callable) -> Optional[dict]:
+        """Full refresh unless the index has courses or was refreshed already; concurrent callers build once."""
+        async with self._refresh_lock:
+            if len(self) or self.last_refresh is not None:
+                return None
+            return await self._refresh(acquire, True)
+
+    async def _refresh(self, acquire: Callable, full: bool) -> dict:
+        # May load the model; vectors from another encoder are all re-encoded, not merged
+        fingerprint = await asyncio.to_thread(self.get_fingerprint) if self.get_fingerprint else None
+        reencode = fingerprint != self.fingerprint and len(self) > 0
+        if reencode:
+            logger.warning(f"Course index was encoded by {self.fingerprint}, the encoder is now {fingerprint}; re-encoding")
+            full = True
+
+        async with acquire() as conn:
+            live_ids, changed_rows, stats = await self._fetch(conn, full)
+
+        current = [] if reencode else self.courses
+        # Rows whose text is unchanged keep their vector: without updated_at every refresh fetches every course
+        stored_texts = {course["course_id"]: course["text"] for course in current}
+        changed_texts = [f"{row['name']} {row['description']}" for row in changed_rows]
+        to_encode = [i for i, row in enumerate(changed_rows) if stored_texts.get(str(row["id"])) != changed_texts[i]]
+        # Encoding is CPU-bound: keep it off the event loop (and off the connection)
+        encoded = await asyncio.to_thread(self.encode, [changed_texts[i] for i in to_encode]) if to_encode else None
+        encoded_vectors = {i: encoded[j] for j, i in enumerate(to_encode)}
+
+        positions = {course["course_id"]: i for i, course in enumerate(current)}
+        # Re-quantizing dequantized rows gives the same rows back (the int8 row scale is unchanged)
+        stored = self.vectors.dequantize() if current and self.vectors is not None else None
+        vectors = {course["course_id"]: stored[i] for i, course in enumerate(current)}
+        # Copies: the current snapshot may be read while this refresh runs
+        courses = {course["course_id"]: dict(course) for course in current}
+
+        watermark = self.watermark
+        for i, row in enumerate(changed_rows):
+            course_id = str(row["id"])
+            courses[course_id] = {
+                "course_id": course_id,
+                "name": row["name"],
+                "text": changed_texts[i],
+                "image_url": row["image_url"],
+                "track_id": str(row["track_id"]) if row["track_id"] else None,
+            }
+            if i in encoded_vectors:
+                vectors[course_id] = encoded_vectors[i]
+            if row["updated_at"] is not None and (watermark is None or row["updated_at"] > watermark):
+                watermark = row["updated_at"]
+
+        deleted = [course_id for course_id in courses if course_id not in live_ids]
+        for course_id in deleted:
+            del courses[course_id]
+            del vectors[course_id]
+
+        # Stats are refreshed for every course; they move with contents and reviews
+        for course_id, course in courses.items():
+            row = stats.get(course_id)
+            course["total_video_minutes"] = int(row["total_video_minutes"]) if row else 0
+            course["total_lessons"] = int(row["total_lessons"]) if row else 0
+            course["average_rating"] = float(row["average_rating"]) if row and row["average_rating"] is not None else None
+
+        # Keep existing rows in place and append new ones, then swap in one assignment
+        ordered_ids = sorted(courses, key=lambda course_id: positions.get(course_id, len(positions)))
+        new_courses = [courses[course_id] for course_id in ordered_ids]
+        new_vectors = QuantizedMatrix.quantize(
+            np.stack([vectors[course_id] for course_id in ordered_ids]), self.dtype
+        ) if ordered_ids else None
+        self._data = (new_courses, new_vectors, KeywordIndex([course["text"] for course in new_courses]))
+        self._save(watermark, fingerprint)
+        # Only advanced once the rows it covers are in place (and on disk)
+        self.watermark = watermark
+        self.fingerprint = fingerprint
+        self.last_refresh = datetime.now()
+
+        result = {"changed": len(changed_rows), "encoded": len(to_encode), "deleted": len(deleted),
+                  "total": len(self.courses)}
+        logger.info(f"Course index refreshed: {result}")
+        return result
+
+    async def _fetch(self, conn, full: bool):
+        """(live ids, rows to (re-)encode, stats by id) in one go, so the connection is released before encoding."""
+        if self._has_updated_at is None:
+            self._has_updated_at = await conn.fetchval("""
+                SELECT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'courses' AND column_name = $1)
+            """, self.updated_at_column)
+            if not self._has_updated_at:
+                logger.warning(f"courses.{self.updated_at_column} does not exist; every course index refresh is a full one")
+        # Without the column there is no watermark to go by
+        column = self.updated_at_column if self._has_updated_at else "NULL::timestamp"
+        watermark = None if full or not self._has_updated_at else self.watermark
+
+        live_ids = {str(row["id"]) for row in await conn.fetch(f"SELECT id FROM courses WHERE {COURSE_FILTER}")}
+        if watermark is None:
+            changed_rows = await conn.fetch(f"""
+                SELECT id, name, description, image_url, track_id, {column} AS updated_at
+                FROM courses WHERE {COURSE_FILTER}
+            """)
+        else:
+            # Past the watermark, plus live courses the index has never seen (e.g. backdated rows)
+            unseen = sorted(live_ids - {course["course_id"] for course in self.courses})
+            changed_rows = await conn.fetch(f"""
+                SELECT id, name, description, image_url, track_id, {column} AS updated_at
+                FROM courses WHERE {COURSE_FILTER} AND ({column} > $1 OR id::text = ANY($2::text[]))
+            """, watermark, unseen)
+        stats = {str(row["id"]): row for row in await self._fetch_stats(conn)}
+        return live_ids, changed_rows, stats
+
+    async def _fetch_stats(self, conn):
+        if not self.stats_view:
+            return await conn.fetch(STATS_QUERY)
+        await conn.execute(STATS_VIEW_REFRESH)
+        return await conn.fetch(STATS_VIEW_QUERY)
+
+    def snapshot(self):
+        """(courses, vectors, keywords) that stay consistent while a refresh runs."""
+        return self._data
+
+    def stats(self) -> dict:
+        return {
+            "courses": len(self.courses),
+            "vector_dtype": self.dtype,
+            "vector_bytes": self.vectors.nbytes if self.vectors is not None else 0,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+        }
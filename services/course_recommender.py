@@ -1,7 +1,61 @@
-import asyncpg
-from sentence_transformers import SentenceTransformer, util
-
-model = SentenceTransformer('all-MiniLM-L6-v2')
+import asyncio
+import logging
+import os
+import numpy as np
+from services import db
+from services.batch_encoder import get_batch_encoder
+from services.course_index import CourseIndex
+from services.developer_cache import developer_cache
+from services.encoding import encode_texts
+from services.inference_executor import inference_executor
+from services.model_registry import encoder_fingerprint, get_sentence_transformer, on_warm_up
+from services.vector_index import normalize_rows, top_k_indices
+
+logger = logging.getLogger("course_recommender")
+
+COURSE_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Course embeddings + stats live in a persisted index, refreshed in the background
+COURSE_INDEX_DIR = os.getenv("COURSE_INDEX_DIR", "./cache/course_index")
+COURSE_UPDATED_AT_COLUMN = os.getenv("COURSE_UPDATED_AT_COLUMN", "updated_at")
+COURSE_INDEX_REFRESH_SECONDS = int(os.getenv("COURSE_INDEX_REFRESH_SECONDS", "300"))
+# Course embedding storage: "float32", "float16" or "int8"
+COURSE_VECTOR_DTYPE = os.getenv("COURSE_VECTOR_DTYPE", "float32")
+# Read course stats from the course_stats materialized view (apply sql/course_stats.sql first)
+COURSE_STATS_VIEW = os.getenv("COURSE_STATS_VIEW", "0") == "1"
+
+def get_course_model():
+    return get_sentence_transformer(COURSE_MODEL_NAME)
+
+on_warm_up(get_course_model)
+
+def course_fingerprint():
+    return encoder_fingerprint(COURSE_MODEL_NAME)
+
+def encode_courses(texts):
+    # Long course descriptions are pooled over passages rather than truncated
+    return normalize_rows(encode_texts(get_course_model(), texts))
+
+def encode_developer(text):
+    # Batched with concurrent developer encodes here and in services/recommender.py (same model).
+    # A copy, not a row view: the cached vector must not keep the whole batch array alive
+    return np.array(normalize_rows(get_batch_encoder(COURSE_MODEL_NAME).encode([text]))[0], dtype=np.float32, copy=True)
+
+course_index = CourseIndex(COURSE_INDEX_DIR, encode_courses, COURSE_UPDATED_AT_COLUMN, COURSE_VECTOR_DTYPE,
+                           COURSE_STATS_VIEW, fingerprint=course_fingerprint)
+
+async def refresh_course_index(full: bool = False) -> dict:
+    return await course_index.refresh(db.acquire, full=full)
+
+async def refresh_course_index_periodically():
+    while True:
+        try:
+            await refresh_course_index()
+        except Exception as e:
+            logger.error(f"Course index refresh failed: {e}")
+        if COURSE_INDEX_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(COURSE_INDEX_REFRESH_SECONDS)
 
 def format_duration(minutes):
     hours = minutes // 60
@@ -14,90 +68,68 @@ def format_duration(minutes):
         return f"{mins}min"
 
 async def get_course_recommendations(developer_id: str):
-    conn = await asyncpg.connect(
-        user="postgres", password="CareerK132@", database="CareerK", host="localhost"
-    )
-
-    try:
+    async with db.acquire() as conn:
         # 1. Get developer profile
         dev_row = await conn.fetchrow("""
             SELECT skills, interested_courses, current_track, track_level, brief_bio
             FROM developers WHERE id = $1
         """, developer_id)
 
-        if not dev_row:
-            raise ValueError("Developer not found.")
-
-        skills = dev_row["skills"] or []
-        interests = dev_row["interested_courses"] or []
-        dev_keywords = skills + interests
-        dev_text = " ".join(dev_keywords).strip()
-
-        if not dev_text:
-            fallback_keywords = [
-                dev_row["current_track"] or "",
-                dev_row["track_level"] or "",
-                dev_row["brief_bio"] or ""
-            ]
-            dev_text = " ".join(fallback_keywords).strip()
-
-        if not dev_text:
-            return []
-
-        dev_embedding = model.encode(dev_text, convert_to_tensor=True)
-
-        # 2. Load courses with lesson/rating/duration info
-        course_rows = await conn.fetch("""
-            SELECT
-                c.id,
-                c.name,
-                c.description,
-                c.image_url,
-                c.track_id,
-                COALESCE(SUM(CASE WHEN cc.type = 'video' THEN cc.video_time_minutes ELSE 0 END), 0) AS total_video_minutes,
-                COUNT(cc.*) FILTER (WHERE cc.type IN ('video', 'quiz')) AS total_lessons,
-                ROUND(AVG(cr.rating)::numeric, 1) AS average_rating
-            FROM courses c
-            LEFT JOIN course_contents cc ON c.id = cc.course_id
-            LEFT JOIN course_reviews cr ON c.id = cr.course_id
-            WHERE c.name IS NOT NULL AND c.description IS NOT NULL
-            GROUP BY c.id
-        """)
-
-        recommendations = []
-
-        for row in course_rows:
-            course_text = f"{row['name']} {row['description']}"
-            course_embedding = model.encode(course_text, convert_to_tensor=True)
-            similarity = util.cos_sim(dev_embedding, course_embedding).item()
-
-            # BOOST: Match with developer keywords
-            keyword_match = 0
-            for kw in dev_keywords:
-                if kw.lower() in course_text.lower():
-                    keyword_match += 1
-
-            keyword_boost = min(keyword_match * 0.02, 0.1)  # Max +0.1
-            score = similarity + keyword_boost
-
-            if score >= 0.15:  # ✅ Loosened threshold
-                recommendations.append({
-                    "course_id": str(row["id"]),
-                    "name": row["name"],
-                    "image_url": row["image_url"],
-                    "track_id": str(row["track_id"]) if row["track_id"] else None,
-                    "duration": format_duration(row["total_video_minutes"]),
-                    "rating": float(row["average_rating"]) if row["average_rating"] is not None else None,
-                    "total_lessons": row["total_lessons"],
-                    "score": round(score, 4)
-                })
-
-        recommendations.sort(key=lambda x: x["score"], reverse=True)
-        return recommendations[:20]  # ✅ Up to 20 top matches
-
-    finally:
-        await conn.close()
-
+    if not dev_row:
+        raise ValueError("Developer not found.")
+
+    skills = dev_row["skills"] or []
+    interests = dev_row["interested_courses"] or []
+    dev_keywords = skills + interests
+    dev_text = " ".join(dev_keywords).strip()
+
+    if not dev_text:
+        fallback_keywords = [
+            dev_row["current_track"] or "",
+            dev_row["track_level"] or "",
+            dev_row["brief_bio"] or ""
+        ]
+        dev_text = " ".join(fallback_keywords).strip()
+
+    if not dev_text:
+        return []
+
+    # Same developer and dev_text as a recent call: reuse its embedding
+    dev_embedding = developer_cache.get("course", developer_id, dev_text)
+    if dev_embedding is None:
+        # Model load and encode happen on the inference pool, not the event loop
+        dev_embedding = await inference_executor.run(encode_developer, dev_text)
+        developer_cache.put("course", developer_id, dev_text, dev_embedding)
+
+    # 2. Score against the precomputed course index (built once on first use if empty)
+    await course_index.build_if_empty(db.acquire)
+    courses, course_vectors, course_keywords = course_index.snapshot()
+    if not courses:
+        return []
+    similarities = course_vectors.dot(dev_embedding)
+
+    # BOOST: Match with developer keywords
+    keyword_boost = np.minimum(course_keywords.count_matches(dev_keywords) * 0.02, 0.1)  # Max +0.1
+    scores = similarities + keyword_boost
+
+    candidates = np.flatnonzero(scores >= 0.15)  # ✅ Loosened threshold
+    # ✅ Up to 20 top matches, partial sort only
+    top = candidates[top_k_indices(scores[candidates], 20)]
+
+    recommendations = []
+    for i in top:
+        course = courses[i]
+        recommendations.append({
+            "course_id": course["course_id"],
+            "name": course["name"],
+            "image_url": course["image_url"],
+            "track_id": course["track_id"],
+            "duration": format_duration(course["total_video_minutes"]),
+            "rating": course["average_rating"],
+            "total_lessons": course["total_lessons"],
+            "score": round(float(scores[i]), 4)
+        })
+    return recommendations
 
 
 
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import asyncpg
+import numpy as np
+from dotenv import load_dotenv
+
+# The settings below are read at import, so .env has to be loaded first
+load_dotenv()
+
+logger = logging.getLogger("db")
+
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+DB_NAME = os.getenv("DB_NAME", "CareerK")
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Prepared statements cached per connection (asyncpg's statement_cache_size)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+# Recent acquire wait times (ms), for percentiles
+_waits_ms = deque(maxlen=1000)
+_acquisitions = 0
+_total_wait_ms = 0.0
+
+
+async def init_pool():
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            return _pool
+        _pool = await asyncpg.create_pool(
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        )
+        logger.info(f"Postgres pool ready ({DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE} connections to {DB_HOST}/{DB_NAME})")
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
+async def acquire():
+    """Borrow a pooled connection; the wait for a free one is recorded for pool_stats()."""
+    global _acquisitions, _total_wait_ms
+    pool = _pool or await init_pool()
+    start = time.perf_counter()
+    async with pool.acquire() as conn:
+        wait_ms = (time.perf_counter() - start) * 1000
+        _waits_ms.append(wait_ms)
+        _acquisitions += 1
+        _total_wait_ms += wait_ms
+        yield conn
+
+
+def pool_stats() -> dict:
+    waits = np.array(_waits_ms) if _waits_ms else None
+    return {
+        "size": _pool.get_size() if _pool else 0,
+        "idle": _pool.get_idle_size() if _pool else 0,
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "acquisitions": _acquisitions,
+        "wait_ms_mean": round(_total_wait_ms / _acquisitions, 3) if _acquisitions else 0.0,
+        "wait_ms_p50": round(float(np.percentile(waits, 50)), 3) if waits is not None else 0.0,
+        "wait_ms_p95": round(float(np.percentile(waits, 95)), 3) if waits is not None else 0.0,
+        "wait_ms_max": round(float(waits.max()), 3) if waits is not None else 0.0,
+    }
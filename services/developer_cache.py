@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger("developer_cache")
+
+# How long a developer's encoded profile is reused, and how many profiles are kept
+DEVELOPER_CACHE_TTL_SECONDS = float(os.getenv("DEVELOPER_CACHE_TTL_SECONDS", "600"))
+DEVELOPER_CACHE_SIZE = int(os.getenv("DEVELOPER_CACHE_SIZE", "10000"))
+
+
+def profile_hash(profile_text: str) -> str:
+    return hashlib.sha1(profile_text.encode("utf-8")).hexdigest()
+
+
+class DeveloperCache:
+    """Per-developer values derived from their profile (embeddings, tokens), with a TTL.
+
+    Entries are keyed by (namespace, developer id); each recommender uses its own
+    namespace since they encode different texts with different models. An entry only
+    counts as a hit while the hash of the profile text it was computed from matches the
+    current one, so an edited profile is recomputed at once; the TTL bounds how long an
+    entry lives at all. invalidate() drops every namespace of a developer. LRU beyond
+    `max_entries`.
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, namespace: str, developer_id: str, profile_text: str):
+        key = (namespace, developer_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            digest, value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                return None
+            if digest != profile_hash(profile_text):
+                del self._entries[key]
+                self.stale += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, namespace: str, developer_id: str, profile_text: str, value):
+        key = (namespace, developer_id)
+        with self._lock:
+            self._entries[key] = (profile_hash(profile_text), value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, namespace: str, developer_id: Optional[str], profile_text: str, compute: Callable[[], object]):
+        """Cached value for this developer and profile, calling `compute` on a miss.
+
+        Without a developer id (or with caching disabled) nothing is cached.
+        """
+        if not developer_id or self.ttl_seconds <= 0:
+            return compute()
+        value = self.get(namespace, developer_id, profile_text)
+        if value is None:
+            value = compute()
+            self.put(namespace, developer_id, profile_text, value)
+        return value
+
+    def invalidate(self, developer_id: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key[1] == developer_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.invalidations += count
+            return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale + self.expired
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+developer_cache = DeveloperCache(DEVELOPER_CACHE_TTL_SECONDS, DEVELOPER_CACHE_SIZE)
@@ -0,0 +1,309 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the per-row keys still catch reused rows
+    fcntl = None
+
+logger = logging.getLogger("embedding_cache")
+
+
+class EmbeddingCache:
+    """Two-tier embedding store keyed by sha1(model name + text).
+
+    Each backend of a model (see services.model_registry) gets its own directory and keys:
+    an int8 model's vectors are not interchangeable with the fp32 ones. With `fingerprint`
+    (e.g. services.model_registry.encoder_fingerprint), keys are sha1(fingerprint + text)
+    instead, so vectors encoded under other settings are never returned; it is evaluated
+    on the first lookup, which may load the model.
+
+    Memory tier: bounded LRU of vectors.
+    Disk tier: float32 matrix memory-mapped from `vectors.f32` with a fixed number
+    of slots, plus an append-only `index.log` of "slot key" lines. When every slot is
+    taken the oldest one is overwritten (FIFO), so the disk size stays bounded.
+    Several processes (uvicorn workers) can share a directory: slots are allocated, rows
+    written and the log appended under an exclusive lock on `index.lock`, after replaying
+    what the others appended, and reads hold a shared lock. `keys.u64` stores the key of
+    every row, checked on read, so a row another process reused is a miss, never another
+    text's vector (this is also the only guard where fcntl is unavailable).
+    """
+
+    def __init__(self, model_name: str, cache_dir: str, memory_size: int = 10000, disk_size: int = 100000,
+                 backend: str = "fp32", fingerprint: Optional[Callable[[], str]] = None):
+        self.model_name = model_name
+        self.backend = backend
+        self.get_fingerprint = fingerprint
+        self._key_prefix: Optional[str] = None
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        # fp32 keeps the plain model name, so existing caches stay valid
+        self.namespace = model_name if backend == "fp32" else f"{model_name}@{backend}"
+        self.directory = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", self.namespace))
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._slots: List[Optional[str]] = [None] * disk_size
+        self._key_to_slot = {}
+        self._next_slot = 0
+        self._log_lines = 0
+        # How far index.log has been replayed, and which file that was (compaction replaces it)
+        self._log_offset = 0
+        self._log_inode = None
+        self._vectors = None
+        self._row_keys = None
+        self._dim = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stale_disk = 0
+        self.evictions_memory = 0
+        self.evictions_disk = 0
+        self._load()
+
+    # ==== Keys ====
+    def key(self, text: str) -> str:
+        if self._key_prefix is None:
+            self._key_prefix = self.get_fingerprint() if self.get_fingerprint else self.namespace
+        return hashlib.sha1(f"{self._key_prefix}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _row_key(key: str) -> int:
+        # 64-bit prefix stored next to each row; 0 marks a row being written
+        return int(key[:16], 16) or 1
+
+    # ==== Disk tier ====
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.directory, "keys.u64")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.log")
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Cross-process lock on the directory; callers already hold self._lock."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, "index.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reset(self):
+        self._slots = [None] * self.disk_size
+        self._key_to_slot = {}
+        self._next_slot = 0
+        self._log_lines = 0
+        self._log_offset = 0
+        self._log_inode = None
+        self._vectors = None
+        self._row_keys = None
+        self._dim = None
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._file_lock():
+            try:
+                self._sync()
+                if self._vectors is not None:
+                    logger.info(f"Loaded {len(self._key_to_slot)} cached embeddings from {self.directory}")
+            except Exception as e:
+                logger.warning(f"Discarding embedding cache at {self.directory}: {e}")
+                self._reset()
+                os.remove(self._index_path)
+
+    def _sync(self):
+        """Replay the index.log lines appended since the last call (by any process); all of it after a compaction."""
+        try:
+            stat = os.stat(self._index_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._log_inode:
+            self._reset()
+            self._log_inode = stat.st_ino
+        if stat.st_size == self._log_offset:
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # Writers append whole lines under the exclusive lock
+        data = data[:data.rfind(b"\n") + 1]
+        lines = data.decode("utf-8").splitlines()
+        if self._log_offset == 0 and lines:
+            dim, capacity = (int(value) for value in lines.pop(0).split())
+            if capacity != self.disk_size:
+                raise ValueError(f"capacity changed ({capacity} -> {self.disk_size})")
+            if os.path.getsize(self._vectors_path) != capacity * dim * 4:
+                raise ValueError("vector file size does not match the index")
+            if not os.path.exists(self._keys_path) or os.path.getsize(self._keys_path) != capacity * 8:
+                raise ValueError("no per-row keys (written by an older version)")
+            self._map_files(dim, "r+")
+        for line in lines:
+            slot, key = line.split()
+            self._assign_slot(int(slot), key)
+            self._log_lines += 1
+        self._log_offset += len(data)
+
+    def _map_files(self, dim: int, mode: str):
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(self.disk_size, dim))
+        self._row_keys = np.memmap(self._keys_path, dtype=np.uint64, mode=mode, shape=(self.disk_size,))
+        self._dim = dim
+
+    def _create_files(self, dim: int):
+        # Under the exclusive lock, once _sync() found no index from another process
+        self._map_files(dim, "w+")
+        header = f"{dim} {self.disk_size}\n".encode("utf-8")
+        with open(self._index_path, "wb") as f:
+            f.write(header)
+        self._log_inode = os.stat(self._index_path).st_ino
+        self._log_offset = len(header)
+
+    def _assign_slot(self, slot: int, key: str):
+        previous = self._slots[slot]
+        if previous is not None and self._key_to_slot.get(previous) == slot:
+            del self._key_to_slot[previous]
+        self._slots[slot] = key
+        self._key_to_slot[key] = slot
+        self._next_slot = (slot + 1) % self.disk_size
+
+    def _compact_index(self):
+        # Rewrite the log with one line per live slot so it doesn't grow without bound
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(f"{self._dim} {self.disk_size}\n".encode("utf-8"))
+            # Oldest first, so replaying it restores the same FIFO position
+            for offset in range(self.disk_size):
+                slot = (self._next_slot + offset) % self.disk_size
+                if self._slots[slot] is not None:
+                    f.write(f"{slot} {self._slots[slot]}\n".encode("utf-8"))
+            size = f.tell()
+        os.replace(tmp_path, self._index_path)
+        self._log_inode = os.stat(self._index_path).st_ino
+        self._log_offset = size
+        self._log_lines = len(self._key_to_slot)
+
+    def _write_disk(self, items: List[tuple]):
+        with self._file_lock():
+            # Slots follow on from whatever the other processes allocated last
+            self._sync()
+            if self._vectors is None:
+                self._create_files(items[0][1].shape[0])
+            lines = []
+            for key, vector in items:
+                if key in self._key_to_slot:
+                    continue
+                slot = self._next_slot
+                if self._slots[slot] is not None:
+                    self.evictions_disk += 1
+                self._row_keys[slot] = 0
+                self._vectors[slot] = vector
+                self._row_keys[slot] = self._row_key(key)
+                self._assign_slot(slot, key)
+                lines.append(f"{slot} {key}\n")
+            if not lines:
+                return
+            # Rows hit the files before the index references them
+            self._vectors.flush()
+            self._row_keys.flush()
+            data = "".join(lines).encode("utf-8")
+            with open(self._index_path, "ab") as f:
+                f.write(data)
+            self._log_offset += len(data)
+            self._log_lines += len(lines)
+            if self._log_lines > 2 * self.disk_size:
+                self._compact_index()
+
+    # ==== Memory tier ====
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions_memory += 1
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.hits_memory += 1
+            return vector
+        slot = self._key_to_slot.get(key)
+        if slot is not None and self._row_keys[slot] != self._row_key(key):
+            # Reused by another process since this one last replayed the log
+            del self._key_to_slot[key]
+            self.stale_disk += 1
+            slot = None
+        if slot is not None:
+            vector = np.array(self._vectors[slot])
+            self._remember(key, vector)
+            self.hits_disk += 1
+            return vector
+        self.misses += 1
+        return None
+
+    # ==== Public API ====
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for `texts`, calling `encode_fn` only on texts not cached yet."""
+        keys = [self.key(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing = OrderedDict()
+
+        with self._lock, self._file_lock(exclusive=False):
+            # Picks up vectors other processes cached meanwhile
+            self._sync()
+            for i, key in enumerate(keys):
+                vector = self._lookup(key) if key not in missing else None
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    vectors[i] = vector
+
+        if missing:
+            miss_texts = [texts[positions[0]] for positions in missing.values()]
+            encoded = np.asarray(encode_fn(miss_texts), dtype=np.float32)
+            with self._lock:
+                for (key, positions), vector in zip(missing.items(), encoded):
+                    self._remember(key, vector)
+                    for i in positions:
+                        vectors[i] = vector
+                self._write_disk(list(zip(missing.keys(), encoded)))
+
+        if not vectors:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "fingerprint": self._key_prefix,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "stale_disk": self.stale_disk,
+                "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_size": self.memory_size,
+                "disk_entries": len(self._key_to_slot),
+                "disk_size": self.disk_size,
+                "evictions_memory": self.evictions_memory,
+                "evictions_disk": self.evictions_disk,
+            }
@@ -0,0 +1,96 @@
+import logging
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("encoding")
+
+# Batches are cut by padded size (texts x longest text in tokens) rather than text count,
+# so short texts go through in large batches and long ones in small batches
+ENCODE_TOKEN_BUDGET = int(os.getenv("ENCODE_TOKEN_BUDGET", "8192"))
+# Texts longer than the model's max_seq_length are split into passages overlapping by this
+# many tokens and their embeddings mean-pooled; 0 disables splitting (texts get truncated)
+LONG_TEXT_STRIDE = int(os.getenv("LONG_TEXT_STRIDE", "32"))
+SPLIT_LONG_TEXTS = os.getenv("SPLIT_LONG_TEXTS", "1") == "1"
+
+
+def settings_fingerprint(model, split_long: bool = SPLIT_LONG_TEXTS, stride: int = LONG_TEXT_STRIDE) -> str:
+    """The encode_texts settings a text's vector depends on; the token budget and batch size only change speed."""
+    return f"max_seq_length={model.max_seq_length},split={int(split_long)},stride={stride if split_long else 0}"
+
+
+def passage_spans(offsets: List[Tuple[int, int]], max_tokens: int, stride: int) -> List[Tuple[int, int, int]]:
+    """(start char, end char, tokens) of the passages covering a text with these token offsets."""
+    if len(offsets) <= max_tokens:
+        return [(0, offsets[-1][1] if offsets else 0, len(offsets))]
+    step = max(max_tokens - stride, 1)
+    spans = []
+    for start in range(0, len(offsets), step):
+        end = min(start + max_tokens, len(offsets))
+        spans.append((offsets[start][0], offsets[end - 1][1], end - start))
+        if end == len(offsets):
+            break
+    return spans
+
+
+def bucketed_batches(lengths: np.ndarray, max_batch_size: int, token_budget: int) -> List[np.ndarray]:
+    """Positions grouped into batches of similar length, shortest first.
+
+    A batch grows while (texts x longest length) fits the token budget, up to
+    `max_batch_size` texts; a single text over the budget still gets its own batch.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches, start = [], 0
+    for end in range(1, len(order) + 1):
+        if end == len(order):
+            batches.append(order[start:end])
+            break
+        size = end + 1 - start
+        if size > max_batch_size or size * lengths[order[end]] > token_budget:
+            batches.append(order[start:end])
+            start = end
+    return batches
+
+
+def encode_texts(model, texts: List[str], batch_size: int = 32, token_budget: int = ENCODE_TOKEN_BUDGET,
+                 split_long: bool = SPLIT_LONG_TEXTS, stride: int = LONG_TEXT_STRIDE) -> np.ndarray:
+    """Embeddings of `texts` with a sentence-transformers model, in input order.
+
+    Texts are tokenized once to get their lengths and sorted into length buckets, so a
+    batch pads to the length of similar texts instead of the longest text in the call.
+    Texts over the model's max_seq_length are split into overlapping passages whose
+    embeddings are averaged (weighted by tokens), instead of being truncated.
+    """
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    # Room left for the special tokens ([CLS] / [SEP]) the model adds
+    max_tokens = model.max_seq_length - 2
+    encoded = model.tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True,
+                              truncation=False, verbose=False)
+
+    passages, owners, weights = [], [], []
+    for i, (text, offsets) in enumerate(zip(texts, encoded["offset_mapping"])):
+        spans = passage_spans(offsets, max_tokens, stride) if split_long else [(0, len(text), min(len(offsets), max_tokens))]
+        for start, end, n_tokens in spans:
+            passages.append(text if len(spans) == 1 else text[start:end])
+            owners.append(i)
+            weights.append(max(n_tokens, 1))
+
+    lengths = np.minimum(np.array(weights), max_tokens) + 2
+    vectors = None
+    for batch in bucketed_batches(lengths, batch_size, token_budget):
+        batch_vectors = np.asarray(model.encode([passages[j] for j in batch], batch_size=len(batch)), dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((len(passages), batch_vectors.shape[1]), dtype=np.float32)
+        vectors[batch] = batch_vectors
+
+    if len(passages) == len(texts):
+        return vectors
+    # Token-weighted mean of each text's passages
+    owners = np.array(owners)
+    weights = np.array(weights, dtype=np.float32)
+    pooled = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+    np.add.at(pooled, owners, vectors * weights[:, None])
+    return pooled / np.bincount(owners, weights=weights).astype(np.float32)[:, None]
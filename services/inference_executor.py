@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+import numpy as np
+
+logger = logging.getLogger("inference_executor")
+
+# Model calls running at once, and calls allowed to wait for a slot before requests are rejected
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+
+
+class InferenceOverloaded(Exception):
+    """Every worker is busy and the wait queue is full; main.py answers 503."""
+
+
+class InferenceExecutor:
+    """Bounded thread pool for the CPU-bound model calls of async handlers.
+
+    Handlers await run() instead of calling spaCy / transformers on the event loop, so
+    other requests (and the async DB calls) keep being served meanwhile. At most
+    `workers` calls run at once; up to `max_queue` more wait for a worker, and beyond that
+    run() raises InferenceOverloaded immediately instead of letting latency grow without
+    bound. Threads rather than processes: the models live in this process, and torch
+    releases the GIL while it computes.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 32):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # Recent queue waits and run times (ms), for percentiles
+        self._waits_ms = deque(maxlen=1000)
+        self._runs_ms = deque(maxlen=1000)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._pending - self._running, 0)
+
+    def _call(self, fn: Callable, submitted: float):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._waits_ms.append((started - submitted) * 1000)
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._runs_ms.append((time.perf_counter() - started) * 1000)
+
+    def _finished(self, future: Future):
+        # Runs when the call is done or was cancelled before it started; an awaiting handler
+        # that is cancelled does not stop a call that is already running, which keeps counting
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise InferenceOverloaded(f"{self._pending} inference calls in flight")
+            self._pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            future = self._executor.submit(self._call, partial(fn, *args, **kwargs), time.perf_counter())
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = np.array(self._waits_ms) if self._waits_ms else None
+            runs = np.array(self._runs_ms) if self._runs_ms else None
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "wait_ms_p50": round(float(np.percentile(waits, 50)), 3) if waits is not None else 0.0,
+                "wait_ms_p95": round(float(np.percentile(waits, 95)), 3) if waits is not None else 0.0,
+                "run_ms_p50": round(float(np.percentile(runs, 50)), 3) if runs is not None else 0.0,
+                "run_ms_p95": round(float(np.percentile(runs, 95)), 3) if runs is not None else 0.0,
+            }
+
+
+inference_executor = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_MAX_QUEUE)
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("model_registry")
+
+# Inference backend per model: "fp32" (eager PyTorch) or "int8" (Linear layers dynamically
+# quantized to int8, CPU only). MODEL_BACKENDS overrides the default for single models:
+#   MODEL_BACKENDS="all-mpnet-base-v2=int8,cross-encoder/ms-marco-TinyBERT-L-6=int8"
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "fp32")
+MODEL_BACKENDS = dict(
+    item.rsplit("=", 1) for item in os.getenv("MODEL_BACKENDS", "").split(",") if "=" in item
+)
+BACKENDS = ("fp32", "int8")
+
+# Intra-op threads per torch call; 0 keeps torch's default (one per core). With several
+# inference workers, workers x threads should not exceed the cores.
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+
+try:
+    import psutil
+except ImportError:  # memory figures are simply left out
+    psutil = None
+
+_registry_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+_models: Dict[str, object] = {}
+_load_stats: Dict[str, dict] = {}
+_warm_up_hooks: List[Callable[[], None]] = []
+_torch_configured = False
+
+
+def _rss_mb():
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def load_once(key: str, loader: Callable[[], object]):
+    """Return the object registered under `key`, calling `loader` the first time only.
+
+    Thread-safe: concurrent first calls for the same key wait for a single load;
+    different keys load in parallel.
+    """
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        model = loader()
+        load_seconds = time.perf_counter() - start
+        rss_after = _rss_mb()
+
+        # RSS delta is approximate when other models load at the same time
+        _load_stats[key] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None else None,
+        }
+        _models[key] = model
+        logger.info(f"Loaded {key} in {load_seconds:.2f}s")
+        return model
+
+
+def is_loaded(key: str) -> bool:
+    return key in _models
+
+
+# ==== Inference backends ====
+def backend_for(name: str) -> str:
+    backend = MODEL_BACKENDS.get(name, MODEL_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}' for {name}, expected one of {list(BACKENDS)}")
+    return backend
+
+
+def encoder_fingerprint(name: str) -> str:
+    """Identifies the vectors a sentence-transformers model gives in this process.
+
+    Model, backend and the services.encoding settings (max_seq_length, long-text splitting
+    and stride). Vectors stored under another fingerprint (e.g. fp32 posts next to int8
+    queries, or truncated next to pooled texts) are not comparable and have to be encoded
+    again. Loads the model, for its max_seq_length.
+    """
+    from services import encoding
+    return f"{name}@{backend_for(name)}:{encoding.settings_fingerprint(get_sentence_transformer(name))}"
+
+
+def configure_torch():
+    global _torch_configured
+    if _torch_configured:
+        return
+    _torch_configured = True
+    if TORCH_NUM_THREADS > 0:
+        import torch
+        torch.set_num_threads(TORCH_NUM_THREADS)
+        logger.info(f"torch uses {TORCH_NUM_THREADS} threads per call")
+
+
+def apply_backend(model, backend: str):
+    """Convert a freshly loaded sentence-transformers model to `backend`, in place."""
+    if backend == "int8":
+        import torch
+        # CrossEncoder wraps the transformer in .model on older sentence-transformers
+        module = model if isinstance(model, torch.nn.Module) else model.model
+        torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def _backend_key(kind: str, name: str, backend: str) -> str:
+    return f"{kind}:{name}" if backend == "fp32" else f"{kind}:{name}@{backend}"
+
+
+# ==== Model accessors ====
+def get_spacy(name: str = "en_core_web_sm"):
+    def load():
+        import spacy
+        try:
+            return spacy.load(name)
+        except OSError:
+            import spacy.cli
+            spacy.cli.download(name)
+            return spacy.load(name)
+
+    return load_once(f"spacy:{name}", load)
+
+
+def get_sentence_transformer(name: str, backend: Optional[str] = None):
+    """`backend` defaults to the configured one (MODEL_BACKEND / MODEL_BACKENDS)."""
+    backend = backend or backend_for(name)
+
+    def load():
+        from sentence_transformers import SentenceTransformer
+        configure_torch()
+        return apply_backend(SentenceTransformer(name, device="cpu" if backend == "int8" else None), backend)
+
+    return load_once(_backend_key("sentence_transformer", name, backend), load)
+
+
+def get_cross_encoder(name: str, backend: Optional[str] = None):
+    backend = backend or backend_for(name)
+
+    def load():
+        from sentence_transformers import CrossEncoder
+        configure_torch()
+        return apply_backend(CrossEncoder(name, device="cpu" if backend == "int8" else None), backend)
+
+    return load_once(_backend_key("cross_encoder", name, backend), load)
+
+
+# ==== Warm-up & stats ====
+def on_warm_up(hook: Callable[[], None]) -> Callable[[], None]:
+    """Register a function that loads what a router needs; run by warm_up()."""
+    _warm_up_hooks.append(hook)
+    return hook
+
+
+def warm_up():
+    for hook in _warm_up_hooks:
+        hook()
+
+
+def stats() -> dict:
+    return {
+        "loaded": sorted(_models),
+        "models": dict(_load_stats),
+        "default_backend": MODEL_BACKEND,
+        "backends": dict(MODEL_BACKENDS),
+        "torch_num_threads": TORCH_NUM_THREADS or None,
+        "process_rss_mb": round(_rss_mb(), 1) if psutil is not None else None,
+    }
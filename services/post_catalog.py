@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.quantized_store import QuantizedMatrix
+from services.vector_index import ExactIndex
+
+logger = logging.getLogger("post_catalog")
+
+# Rows reserved for vectors when the first posts arrive
+MIN_CAPACITY = 64
+
+
+class PostCatalog:
+    """Persistent index of job or service posts, ready to be scored.
+
+    Each post keeps its embedding (a row of `vectors`), the lemmatized tokens of every
+    required skill and its parsed experience range, so recommending against the catalog
+    never runs spaCy or the transformer on a post again.
+    Stored as `vectors.npy` (+ `norms.npy`, `scales.npy`) + `meta.json` under
+    `<directory>/<kind>/`; `dtype` picks float32, float16 or int8 storage (see
+    services.quantized_store), and posts are scored on the stored matrix directly.
+    `index` (see services.vector_index) narrows a query down to candidate posts; it is
+    kept in sync with every upsert/delete and rebuilt from the vectors on load.
+    `fingerprint()` (services.model_registry.encoder_fingerprint) is stored with the posts;
+    it is evaluated on the first upsert or search (it may load the model), and a catalog
+    stored under another one is discarded then and has to be ingested again.
+    Vectors live in a buffer with spare rows (doubled when full): an upsert writes its
+    rows in place and a delete moves the last row into the freed one, so neither costs
+    O(catalog). Readers and writers hold `_lock`.
+    Writing the files is O(catalog), so updates only mark the catalog dirty and it is
+    saved at most every `save_interval` seconds (0 = on every update); call flush() on
+    shutdown and periodically so the last updates reach the disk.
+    """
+
+    def __init__(self, kind: str, directory: str, index=None, dtype: str = "float32", save_interval: float = 0,
+                 fingerprint: Optional[Callable[[], str]] = None):
+        self.kind = kind
+        self.get_fingerprint = fingerprint
+        # Current fingerprint once checked, and the one the stored posts were encoded under
+        self.fingerprint: Optional[str] = None
+        self._stored_fingerprint: Optional[str] = None
+        self.index = index or ExactIndex()
+        self.directory = os.path.join(directory, kind)
+        self.dtype = dtype
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.ids: List[str] = []
+        # len(ids) rows in use, the rest is spare capacity
+        self._buffer: Optional[QuantizedMatrix] = None
+        self.skill_tokens: List[List[Tuple[str, ...]]] = []
+        self.experience: List[Tuple[int, int]] = []
+        self._positions: Dict[str, int] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vectors(self) -> Optional[QuantizedMatrix]:
+        """The rows in use (views into the buffer); None when the catalog is empty."""
+        if not self.ids or self._buffer is None:
+            return None
+        return self._buffer.head(len(self.ids))
+
+    def _reserve(self, size: int, dim: int):
+        if self._buffer is None:
+            self._buffer = QuantizedMatrix.quantize(np.empty((0, dim)), self.dtype)
+        if len(self._buffer) < size:
+            self._buffer = self._buffer.resized(max(size, 2 * len(self._buffer), MIN_CAPACITY))
+
+    # ==== Persistence ====
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self._stored_fingerprint = meta.get("fingerprint")
+        self.ids = meta["ids"]
+        self.skill_tokens = [[tuple(tokens) for tokens in skills] for skills in meta["skill_tokens"]]
+        self.experience = [tuple(exp) for exp in meta["experience"]]
+        self._buffer = QuantizedMatrix.load(self.directory, self.dtype) if self.ids else None
+        self._positions = {post_id: i for i, post_id in enumerate(self.ids)}
+        if self.vectors is not None:
+            self.index.maybe_train(self.vectors)
+        logger.info(f"Loaded {len(self.ids)} {self.kind} posts from {self.directory}")
+
+    def _write(self, ids, vectors, skill_tokens, experience):
+        os.makedirs(self.directory, exist_ok=True)
+        if vectors is not None:
+            vectors.save(self.directory)
+        with open(self._meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": self.fingerprint or self._stored_fingerprint,
+                "ids": ids,
+                "skill_tokens": skill_tokens,
+                "experience": experience,
+            }, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+
+    def flush(self) -> bool:
+        """Write the catalog if it changed since the last save; the lock is only held to copy it."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                # Rows are updated in place, so the vectors are copied too
+                vectors = self.vectors.copy() if self.ids else None
+                state = (list(self.ids), vectors, list(self.skill_tokens), list(self.experience))
+                self._dirty = False
+            try:
+                self._write(*state)
+            except Exception:
+                self._dirty = True
+                raise
+            self._last_save = time.monotonic()
+            return True
+
+    def _save_if_due(self):
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.flush()
+
+    def _check_fingerprint(self):
+        """Drop the stored posts if they were encoded under another fingerprint; once, before first use."""
+        if self.fingerprint is not None or self.get_fingerprint is None:
+            return
+        current = self.get_fingerprint()
+        with self._lock:
+            if self.fingerprint is not None:
+                return
+            self.fingerprint = current
+            # Catalogs from before fingerprints were stored are taken as they are
+            stored = self._stored_fingerprint
+            if not stored or stored == current or not self.ids:
+                return
+            logger.warning(f"Discarding {len(self.ids)} {self.kind} posts encoded by {stored}, "
+                           f"the encoder is now {current}; ingest them again")
+            self.ids, self._buffer, self.skill_tokens, self.experience = [], None, [], []
+            self._positions = {}
+            self.index.reset()
+            self._dirty = True
+
+    # ==== Updates ====
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        skill_tokens: List[List[Tuple[str, ...]]],
+        experience: List[Tuple[int, int]],
+    ):
+        self._check_fingerprint()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # A post repeated in one batch is stored once, with its last occurrence
+        latest = {post_id: i for i, post_id in enumerate(ids)}
+        with self._lock:
+            changed = []
+            for post_id, i in latest.items():
+                position = self._positions.get(post_id)
+                if position is None:
+                    position = len(self.ids)
+                    self._positions[post_id] = position
+                    self.ids.append(post_id)
+                    self.skill_tokens.append(skill_tokens[i])
+                    self.experience.append(experience[i])
+                else:
+                    self.skill_tokens[position] = skill_tokens[i]
+                    self.experience[position] = experience[i]
+                changed.append((position, i))
+            positions = np.array([position for position, _ in changed], dtype=np.int64)
+            changed_vectors = vectors[[i for _, i in changed]]
+            self._reserve(len(self.ids), vectors.shape[1])
+            self._buffer.set_rows(positions, changed_vectors)
+            self.index.maybe_train(self.vectors)
+            self.index.set_rows(positions, changed_vectors)
+            self._dirty = True
+        self._save_if_due()
+
+    def delete(self, ids: List[str]) -> int:
+        deleted = 0
+        with self._lock:
+            for post_id in ids:
+                position = self._positions.pop(post_id, None)
+                if position is None:
+                    continue
+                # Move the last post into the freed row so the arrays stay dense
+                last = len(self.ids) - 1
+                if position != last:
+                    self.ids[position] = self.ids[last]
+                    self.skill_tokens[position] = self.skill_tokens[last]
+                    self.experience[position] = self.experience[last]
+                    self._buffer.move_row(last, position)
+                    self._positions[self.ids[position]] = position
+                    self.index.move(last, position)
+                self.ids.pop()
+                self.skill_tokens.pop()
+                self.experience.pop()
+                self.index.truncate(last)
+                deleted += 1
+            if deleted:
+                self._dirty = True
+        if deleted:
+            self._save_if_due()
+        return deleted
+
+    def search(self, query: np.ndarray, n_candidates: int):
+        """(ids, cosine similarities, skill_tokens, experience) of the `n_candidates` posts
+        the index ranks closest to `query` (every post when the catalog is that small)."""
+        self._check_fingerprint()
+        with self._lock:
+            if not self.ids:
+                return [], np.empty(0, dtype=np.float32), [], []
+            if len(self.ids) <= n_candidates:
+                return (list(self.ids), self.vectors.cosine(query),
+                        list(self.skill_tokens), list(self.experience))
+            rows = self.index.search(query, self.vectors, n_candidates)
+            return (
+                [self.ids[i] for i in rows],
+                self.vectors.cosine(query, rows),
+                [self.skill_tokens[i] for i in rows],
+                [self.experience[i] for i in rows],
+            )
@@ -0,0 +1,124 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("ranking_pipeline")
+
+
+@dataclass
+class RankingContext:
+    """One request's posts and running scores, shared by every stage.
+
+    `groups` splits the posts into separately ranked lists (e.g. jobs and services): cut-offs
+    apply per group, while a stage still scores all groups in one call. `data` carries
+    per-request values stages compute once and reuse (developer skills, embedding, ...).
+    """
+    dev_text: str
+    posts: List[Dict]
+    texts: List[str]
+    groups: np.ndarray
+    scores: np.ndarray = None
+    data: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.scores is None:
+            self.scores = np.zeros(len(self.posts), dtype=np.float64)
+
+
+@dataclass
+class Stage:
+    """One step of the cascade.
+
+    `score(context, candidates)` returns the new running scores of `candidates` (post
+    indices). A stage keeps the best `cutoff` candidates per group so far (None = all of
+    them) and hands on only those. `cost_ms` is the expected cost per candidate; it starts
+    at the declared value and follows measured timings from the second call on. An optional stage is shrunk to the
+    candidates the remaining latency budget pays for, and skipped below `min_candidates`;
+    the cut-off still applies, and candidates it could not score rank after those it did.
+    """
+    name: str
+    score: Callable[[RankingContext, np.ndarray], np.ndarray]
+    cutoff: Optional[int] = None
+    cost_ms: float = 0.0
+    optional: bool = False
+    min_candidates: int = 1
+    # Weight of the latest measurement in the running cost estimate
+    cost_smoothing: float = 0.2
+    # The first call pays one-off costs (lazy model load, first allocations) and is not measured
+    warmed_up: bool = field(default=False, init=False, repr=False)
+
+    def observe(self, elapsed_ms: float, n_candidates: int):
+        if not n_candidates:
+            return
+        if not self.warmed_up:
+            self.warmed_up = True
+            return
+        measured = elapsed_ms / n_candidates
+        self.cost_ms += self.cost_smoothing * (measured - self.cost_ms)
+
+
+def top_per_group(candidates: np.ndarray, scores: np.ndarray, depth: np.ndarray, groups: np.ndarray,
+                  limit: Optional[int]) -> np.ndarray:
+    """`candidates` ordered within each group, keeping the first `limit` of each.
+
+    Candidates scored by more stages (`depth`) come first, then higher scores: scores from
+    different stage depths are not on the same scale.
+    """
+    ordered = []
+    for group in np.unique(groups[candidates]):
+        members = candidates[groups[candidates] == group]
+        members = members[np.lexsort((-scores[members], -depth[members]))]
+        ordered.append(members if limit is None else members[:limit])
+    return np.concatenate(ordered) if ordered else candidates
+
+
+class RankingPipeline:
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+
+    def run(self, context: RankingContext, latency_budget_ms: Optional[float] = None,
+            started: Optional[float] = None):
+        """Run the stages in order; returns (ranked post indices per group, timing metadata).
+
+        `started` (a perf_counter value) lets work done before the pipeline count against
+        the budget.
+        """
+        started = started if started is not None else time.perf_counter()
+        candidates = np.arange(len(context.posts))
+        # Number of stages that scored each post
+        depth = np.zeros(len(context.posts), dtype=np.int32)
+        timings = []
+
+        for level, stage in enumerate(self.stages, start=1):
+            candidates = top_per_group(candidates, context.scores, depth, context.groups, stage.cutoff)
+            scored = candidates
+            n_groups = len(np.unique(context.groups[candidates])) if candidates.size else 0
+
+            if stage.optional and latency_budget_ms is not None and stage.cost_ms > 0 and n_groups:
+                remaining_ms = latency_budget_ms - (time.perf_counter() - started) * 1000
+                affordable = int(max(remaining_ms, 0) / stage.cost_ms) // n_groups
+                if affordable < stage.min_candidates:
+                    timings.append({"stage": stage.name, "candidates": 0, "ms": 0.0, "skipped": True})
+                    logger.info(f"Skipped {stage.name}: {remaining_ms:.0f} ms of budget left")
+                    continue
+                scored = top_per_group(candidates, context.scores, depth, context.groups, affordable)
+
+            stage_start = time.perf_counter()
+            if scored.size:
+                context.scores[scored] = stage.score(context, scored)
+                depth[scored] = level
+            elapsed_ms = (time.perf_counter() - stage_start) * 1000
+            stage.observe(elapsed_ms, len(scored))
+            timings.append({"stage": stage.name, "candidates": int(len(scored)),
+                            "ms": round(elapsed_ms, 2), "skipped": False})
+
+        ranked = top_per_group(candidates, context.scores, depth, context.groups, None)
+        metadata = {
+            "latency_budget_ms": latency_budget_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "stages": timings,
+        }
+        return ranked, metadata
@@ -1,24 +1,59 @@
 import logging
+import os
 import re
+import time
 import numpy as np
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer, util, CrossEncoder
-from sklearn.feature_extraction.text import TfidfVectorizer
-from skill_extractor import extract_skills_from_text
+from typing import List, Dict, Optional
+from scipy.sparse import csr_matrix
+from skill_extractor import extract_skills_from_text, get_matcher
+from services.batch_encoder import get_batch_encoder
+from services.embedding_cache import EmbeddingCache
+from services.model_registry import (
+    backend_for, encoder_fingerprint, get_cross_encoder, get_sentence_transformer, on_warm_up,
+)
+from services.ranking_pipeline import RankingContext, RankingPipeline, Stage
+from services.tfidf_store import TfidfStore
+from services.vector_index import normalize_rows
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("recommender")
 
-bi_encoder = SentenceTransformer("all-MiniLM-L6-v2")
-cross_encoder = CrossEncoder("cross-encoder/ms-marco-TinyBERT-L-6")
-tfidf_vectorizer = TfidfVectorizer(max_features=5000)
+BI_ENCODER_NAME = "all-MiniLM-L6-v2"
+CROSS_ENCODER_NAME = "cross-encoder/ms-marco-TinyBERT-L-6"
+
+# Post embeddings and post TF-IDF rows are cached across requests; IDF statistics grow with the catalog
+post_embedding_cache = EmbeddingCache(
+    model_name=BI_ENCODER_NAME,
+    cache_dir=os.getenv("EMBEDDING_CACHE_DIR", "./cache/embeddings"),
+    memory_size=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000")),
+    disk_size=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000")),
+    backend=backend_for(BI_ENCODER_NAME),
+    fingerprint=lambda: encoder_fingerprint(BI_ENCODER_NAME),
+)
+tfidf_store = TfidfStore(
+    directory=os.getenv("TFIDF_STORE_DIR", "./cache/tfidf"),
+    n_features=int(os.getenv("TFIDF_N_FEATURES", str(2 ** 18))),
+    cache_size=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000")),
+    # Posts not sent for this long no longer count in the document frequencies
+    doc_ttl_seconds=float(os.getenv("TFIDF_DOC_TTL_SECONDS", str(30 * 24 * 3600))),
+)
 
 ALPHA = 0.7
 SKILL_WEIGHT = 0.2
 TITLE_WEIGHT = 2
 DESC_WEIGHT = 1
 SKILLS_WEIGHT = 3
-RERANK_TOP_N = 10
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "10"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+# Posts per group the bi-encoder scores, best by skills + TF-IDF first (0 = all)
+SEMANTIC_CUTOFF = int(os.getenv("SEMANTIC_CUTOFF", "0"))
+
+
+@on_warm_up
+def warm_up_recommender():
+    get_sentence_transformer(BI_ENCODER_NAME)
+    get_cross_encoder(CROSS_ENCODER_NAME)
+    get_matcher()
 
 
 def build_developer_profile(dev: Dict) -> str:
@@ -54,83 +89,109 @@ def preprocess(text: str) -> str:
     return re.sub(r"[^a-zA-Z\s]", "", text)
 
 
-def compute_scores(dev_text: str, job_posts: List[Dict], service_posts: List[Dict]):
-    dev_processed = preprocess(dev_text)
-    dev_skills = extract_skills_from_text(dev_text)
-    logger.info(f"Extracted developer skills: {dev_skills}")
-
-    job_texts = [build_post_text(post, "job") for post in job_posts]
-    service_texts = [build_post_text(post, "service") for post in service_posts]
-
-    tfidf_vectorizer.fit([dev_processed] + job_texts + service_texts)
-    dev_tfidf = tfidf_vectorizer.transform([dev_processed])
-    job_tfidfs = tfidf_vectorizer.transform(job_texts)
-    service_tfidfs = tfidf_vectorizer.transform(service_texts)
-
-    dev_embedding = bi_encoder.encode(dev_text, convert_to_tensor=True)
-    job_embeddings = bi_encoder.encode(job_texts, convert_to_tensor=True)
-    service_embeddings = bi_encoder.encode(service_texts, convert_to_tensor=True)
-
-    job_scores = []
-    for i, post in enumerate(job_posts):
-        sem_score = float(util.cos_sim(dev_embedding, job_embeddings[i])[0])
-        kw_score = (dev_tfidf @ job_tfidfs[i].T).data
-        kw_score = float(kw_score[0]) if kw_score.size > 0 else 0.0
-        skills = post.get("skills", []) or []
-        skill_score = len(set(dev_skills) & set(skills)) / len(skills) if skills else 0
-        total = ALPHA * sem_score + (1 - ALPHA) * kw_score + SKILL_WEIGHT * skill_score
-        job_scores.append({"id": post["id"], "score": round(total, 4)})
-
-    service_scores = []
-    for i, post in enumerate(service_posts):
-        sem_score = float(util.cos_sim(dev_embedding, service_embeddings[i])[0])
-        kw_score = (dev_tfidf @ service_tfidfs[i].T).data
-        kw_score = float(kw_score[0]) if kw_score.size > 0 else 0.0
-        skills = post.get("required_skills", []) or []
-        skill_score = len(set(dev_skills) & set(skills)) / len(skills) if skills else 0
-        total = ALPHA * sem_score + (1 - ALPHA) * kw_score + SKILL_WEIGHT * skill_score
-        service_scores.append({"id": post["id"], "score": round(total, 4)})
-
-    job_scores.sort(key=lambda x: x["score"], reverse=True)
-    service_scores.sort(key=lambda x: x["score"], reverse=True)
-
-    return job_scores, service_scores
-
-
-def rerank(dev_text: str, posts: List[Dict], post_texts: List[str], scores: List[Dict]):
-    top = scores[:RERANK_TOP_N]
-    top_ids = [x["id"] for x in top]
-    top_indices = [i for i, p in enumerate(posts) if p["id"] in top_ids]
-    pairs = [(dev_text, post_texts[i]) for i in top_indices]
-    rerank_scores = cross_encoder.predict(pairs)
-
-    updated = []
-    for i, idx in enumerate(top_indices):
-        original = scores[idx]["score"]
-        new_score = 0.7 * original + 0.3 * rerank_scores[i]
-        updated.append({"id": posts[idx]["id"], "score": round(new_score, 4)})
-
-    return sorted(updated, key=lambda x: x["score"], reverse=True)
-
-
-def recommend_for_developer(developer: Dict, job_posts: List[Dict], service_posts: List[Dict], rerank_enabled=True):
+# ==== Ranking stages ====
+def skill_incidence(skill_lists: List[List[str]]):
+    """Sparse post x skill matrix (1 where the post lists the skill) and its skill -> column map."""
+    columns = {}
+    rows, cols = [], []
+    for i, skills in enumerate(skill_lists):
+        for skill in set(skills):
+            rows.append(i)
+            cols.append(columns.setdefault(skill, len(columns)))
+    matrix = csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(skill_lists), max(len(columns), 1)),
+    )
+    return matrix, columns
+
+
+def skill_stage(context: RankingContext, candidates: np.ndarray) -> np.ndarray:
+    # Distinct skills the post shares with the developer, over the post's skill list length
+    skill_lists = [context.data["skill_lists"][i] for i in candidates]
+    incidence, columns = skill_incidence(skill_lists)
+    dev_vector = np.zeros(incidence.shape[1], dtype=np.float32)
+    dev_vector[[columns[skill] for skill in set(context.data["dev_skills"]) if skill in columns]] = 1.0
+    lengths = np.array([len(skills) for skills in skill_lists], dtype=np.float32)
+    overlap = np.divide(incidence @ dev_vector, lengths, out=np.zeros_like(lengths), where=lengths > 0)
+    return context.scores[candidates] + SKILL_WEIGHT * overlap
+
+
+def keyword_stage(context: RankingContext, candidates: np.ndarray) -> np.ndarray:
+    # Posts count in the document frequencies by id, so an edited post replaces its old text
+    dev_tfidf, post_tfidfs = tfidf_store.transform(
+        preprocess(context.dev_text), [context.texts[i] for i in candidates],
+        [f"{('job', 'service')[context.groups[i]]}:{context.posts[i]['id']}" for i in candidates],
+    )
+    keyword = (post_tfidfs @ dev_tfidf.T).toarray().ravel()
+    return context.scores[candidates] + (1 - ALPHA) * keyword
+
+
+def semantic_stage(context: RankingContext, candidates: np.ndarray) -> np.ndarray:
+    # Developer and post texts join the model's cross-request batches
+    bi_encoder = get_batch_encoder(BI_ENCODER_NAME)
+    dev_embedding = bi_encoder.encode([context.dev_text])[0]
+    dev_embedding = dev_embedding / max(np.linalg.norm(dev_embedding), 1e-12)
+    post_embeddings = post_embedding_cache.encode([context.texts[i] for i in candidates], bi_encoder.encode)
+    return context.scores[candidates] + ALPHA * (normalize_rows(post_embeddings) @ dev_embedding)
+
+
+def rerank_stage(context: RankingContext, candidates: np.ndarray) -> np.ndarray:
+    # Jobs and services go through the cross-encoder in one batched predict
+    pairs = [(context.dev_text, context.texts[i]) for i in candidates]
+    cross_scores = get_cross_encoder(CROSS_ENCODER_NAME).predict(pairs, batch_size=RERANK_BATCH_SIZE)
+    return 0.7 * np.round(context.scores[candidates], 4) + 0.3 * np.asarray(cross_scores, dtype=np.float64)
+
+
+# Cheapest first; a cut-off (per jobs / services) narrows what the later, costlier stages see.
+# Costs are per candidate, in ms, and follow measured timings.
+RANKING_STAGES = [
+    Stage("skills", skill_stage, cost_ms=0.001),
+    Stage("tfidf", keyword_stage, cost_ms=0.05),
+    Stage("semantic", semantic_stage, cutoff=SEMANTIC_CUTOFF or None, cost_ms=2.0),
+    Stage("rerank", rerank_stage, cutoff=RERANK_TOP_N, cost_ms=5.0, optional=True),
+]
+ranking_pipeline = RankingPipeline(RANKING_STAGES)
+retrieval_pipeline = RankingPipeline([stage for stage in RANKING_STAGES if stage.name != "rerank"])
+
+
+def recommend_for_developer(developer: Dict, job_posts: List[Dict], service_posts: List[Dict], rerank_enabled=True,
+                            latency_budget_ms: Optional[float] = None):
     logger.info("🔍 Starting recommendation...")
+    started = time.perf_counter()
 
     dev_text = build_developer_profile(developer)
-    job_scores, service_scores = compute_scores(dev_text, job_posts, service_posts)
-
-    if rerank_enabled:
-        job_scores = rerank(dev_text, job_posts, [build_post_text(p, "job") for p in job_posts], job_scores)
-        service_scores = rerank(dev_text, service_posts, [build_post_text(p, "service") for p in service_posts], service_scores)
+    dev_skills = extract_skills_from_text(dev_text)
+    logger.info(f"Extracted developer skills: {dev_skills}")
 
-    logger.info("✅ Recommendation finished.")
+    # Jobs (group 0) and services (group 1) are ranked separately but scored as one block
+    posts = job_posts + service_posts
+    context = RankingContext(
+        dev_text=dev_text,
+        posts=posts,
+        texts=[build_post_text(post, "job") for post in job_posts] +
+              [build_post_text(post, "service") for post in service_posts],
+        groups=np.array([0] * len(job_posts) + [1] * len(service_posts), dtype=np.int8),
+        data={
+            "dev_skills": dev_skills,
+            "skill_lists": [post.get("skills", []) or [] for post in job_posts] +
+                           [post.get("required_skills", []) or [] for post in service_posts],
+        },
+    )
+    pipeline = ranking_pipeline if rerank_enabled else retrieval_pipeline
+    ranked, metadata = pipeline.run(context, latency_budget_ms=latency_budget_ms, started=started)
+
+    results = [[], []]
+    for i in ranked:
+        results[context.groups[i]].append({"id": posts[i]["id"], "score": round(float(context.scores[i]), 4)})
+
+    logger.info(f"✅ Recommendation finished in {metadata['total_ms']} ms.")
     return {
-        "job_recommendations": job_scores,
-        "service_recommendations": service_scores
+        "job_recommendations": results[0],
+        "service_recommendations": results[1],
+        "metadata": metadata,
     }
 
 
-
 # import logging
 # import re
 # import numpy as np
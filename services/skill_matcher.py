@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("skill_matcher")
+
+
+def normalize(skill: str) -> str:
+    return re.sub(r"[^\w\s]", "", skill.lower().strip())
+
+
+def fingerprint(paths: List[str]) -> str:
+    """Identifies the source datasets, so a stale compiled matcher gets rebuilt."""
+    parts = [f"{os.path.abspath(path)}:{os.path.getsize(path)}:{int(os.path.getmtime(path))}" for path in paths]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class SkillMatcher:
+    """Token-level Aho-Corasick automaton over normalized skill phrases.
+
+    Text is normalized like the skills (lowercase, punctuation removed) and split on
+    whitespace, so matches always start and end on word boundaries. One pass over the
+    tokens reports every skill occurrence, overlapping ones included, in O(tokens + matches).
+    A pattern is either a skill or an alias of one; matches report the skill.
+
+    Compiled form, one .npy file per array under a directory (see save() / load()); the
+    string lists are stored as newline-joined UTF-8 buffers, so the whole artifact can be
+    memory-mapped:
+      tokens           vocabulary, token id -> token
+      skills           skill id -> normalized skill
+      pattern_skill    pattern id -> skill id (aliases point at their skill)
+      sequence_tokens  token ids of every pattern, concatenated
+      sequence_offsets pattern id -> start in sequence_tokens (one extra end offset)
+      edge_keys        sorted `parent * len(tokens) + token_id` of every trie edge
+      edge_children    child node of each edge
+      fail             failure link of each node (longest proper suffix that is a trie node)
+      output           skill id of the pattern ending at each node, or -1
+      dict_link        nearest node on the failure chain with an output, or -1
+    """
+
+    STRINGS = ("tokens", "skills")
+    ARRAYS = ("pattern_skill", "sequence_tokens", "sequence_offsets",
+              "edge_keys", "edge_children", "fail", "output", "dict_link")
+
+    def __init__(self, tokens: List[str], skills: List[str], pattern_skill, sequence_tokens, sequence_offsets,
+                 edge_keys, edge_children, fail, output, dict_link, source: str = ""):
+        self.tokens = tokens
+        self.skills = skills
+        self.pattern_skill = pattern_skill
+        self.sequence_tokens = sequence_tokens
+        self.sequence_offsets = sequence_offsets
+        self.edge_keys = edge_keys
+        self.edge_children = edge_children
+        self.fail = fail
+        self.output = output
+        self.dict_link = dict_link
+        self.source = source
+        self._prepare()
+
+    def _prepare(self):
+        # The vocabulary is a dict (tokens are decoded strings anyway); the automaton is
+        # read straight from the arrays, so a memory-mapped artifact is never copied.
+        # np.asarray drops the memmap subclass (and its per-access overhead), not the mapping
+        self._vocab: Dict[str, int] = {token: i for i, token in enumerate(self.tokens)}
+        self._n_tokens = max(len(self._vocab), 1)
+        self._edge_keys = np.asarray(self.edge_keys)
+        self._edge_children = np.asarray(self.edge_children)
+        self._fail = np.asarray(self.fail)
+        self._output = np.asarray(self.output)
+        self._dict_link = np.asarray(self.dict_link)
+        # Offset table for the root, where most transitions start: token id -> child, or -1.
+        # Root edges are the keys below n_tokens (parent 0), i.e. the first few
+        n_root = int(self._edge_keys.searchsorted(self._n_tokens))
+        self._root = np.full(self._n_tokens, -1, dtype=np.int64)
+        self._root[self._edge_keys[:n_root]] = self._edge_children[:n_root]
+        self._root_children = self._root.tolist()
+
+    def _goto(self, state: int, token: int) -> int:
+        """Child of `state` on `token` (binary search over the sorted edge keys), or -1."""
+        if state == 0:
+            return self._root_children[token]
+        key = state * self._n_tokens + token
+        i = int(self._edge_keys.searchsorted(key))
+        if i < len(self._edge_keys) and self._edge_keys[i] == key:
+            return int(self._edge_children[i])
+        return -1
+
+    def __len__(self) -> int:
+        return len(self.skills)
+
+    @property
+    def n_patterns(self) -> int:
+        return len(self.pattern_skill)
+
+    def pattern(self, pattern_id: int) -> str:
+        start, end = self.sequence_offsets[pattern_id], self.sequence_offsets[pattern_id + 1]
+        return " ".join(self.tokens[token] for token in self.sequence_tokens[start:end])
+
+    def aliases(self) -> Dict[str, str]:
+        """alias -> skill, for every pattern that is not the skill itself."""
+        found = {}
+        for pattern_id, skill_id in enumerate(self.pattern_skill.tolist()):
+            pattern = self.pattern(pattern_id)
+            if pattern != self.skills[skill_id]:
+                found[pattern] = self.skills[skill_id]
+        return found
+
+    # ==== Build ====
+    @classmethod
+    def build(cls, skills: Iterable[str], aliases: Optional[Dict[str, str]] = None,
+              source: str = "") -> "SkillMatcher":
+        """Compile normalized `skills`, plus `aliases` (normalized alias -> normalized skill)."""
+        skill_list = sorted(set(" ".join(skill.split()) for skill in skills) - {""})
+        skill_ids = {skill: i for i, skill in enumerate(skill_list)}
+        patterns = [(skill, i) for i, skill in enumerate(skill_list)]
+        for alias, skill in sorted((aliases or {}).items()):
+            alias, skill = " ".join(alias.split()), " ".join(skill.split())
+            if alias and alias not in skill_ids and skill in skill_ids:
+                patterns.append((alias, skill_ids[skill]))
+
+        vocab: Dict[str, int] = {}
+        children: List[Dict[int, int]] = [{}]
+        output = [-1]
+        pattern_skill, sequence_tokens, sequence_offsets = [], [], [0]
+
+        for pattern, skill_id in patterns:
+            node = 0
+            for word in pattern.split():
+                token = vocab.setdefault(word, len(vocab))
+                sequence_tokens.append(token)
+                child = children[node].get(token)
+                if child is None:
+                    child = len(children)
+                    children[node][token] = child
+                    children.append({})
+                    output.append(-1)
+                node = child
+            if output[node] == -1:
+                output[node] = skill_id
+            pattern_skill.append(skill_id)
+            sequence_offsets.append(len(sequence_tokens))
+
+        # Breadth-first failure links, as in the classic Aho-Corasick construction
+        fail = [0] * len(children)
+        dict_link = [-1] * len(children)
+        queue = deque(children[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in children[node].items():
+                state = fail[node]
+                while state and token not in children[state]:
+                    state = fail[state]
+                target = children[state].get(token, 0)
+                fail[child] = target if target != child else 0
+                dict_link[child] = fail[child] if output[fail[child]] != -1 else dict_link[fail[child]]
+                queue.append(child)
+
+        n_tokens = max(len(vocab), 1)
+        edges = sorted((parent * n_tokens + token, child)
+                       for parent, node_children in enumerate(children)
+                       for token, child in node_children.items())
+        return cls(
+            tokens=sorted(vocab, key=vocab.get),
+            skills=skill_list,
+            pattern_skill=np.array(pattern_skill, dtype=np.int32),
+            sequence_tokens=np.array(sequence_tokens, dtype=np.int32),
+            sequence_offsets=np.array(sequence_offsets, dtype=np.int64),
+            edge_keys=np.array([key for key, _ in edges], dtype=np.int64),
+            edge_children=np.array([child for _, child in edges], dtype=np.int32),
+            fail=np.array(fail, dtype=np.int32),
+            output=np.array(output, dtype=np.int32),
+            dict_link=np.array(dict_link, dtype=np.int32),
+            source=source,
+        )
+
+    @classmethod
+    def from_datasets(cls, paths: List[str]) -> "SkillMatcher":
+        """Compile JSON skill lists, like skills-dataset/kaggle_skills.json."""
+        skills = set()
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                skills.update(normalize(skill) for skill in json.load(f) if len(skill) > 1)
+        return cls.build(skills, source=fingerprint(paths))
+
+    # ==== Persistence ====
+    def save(self, directory: str, **meta):
+        """Write the artifact; files are swapped in one by one, then meta.json marks it complete."""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        arrays = {name: np.frombuffer("\n".join(getattr(self, name)).encode("utf-8"), dtype=np.uint8)
+                  for name in self.STRINGS}
+        arrays.update((name, getattr(self, name)) for name in self.ARRAYS)
+        for name, array in arrays.items():
+            path = os.path.join(directory, f"{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(path + ".tmp", path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "skills": len(self.skills), "patterns": self.n_patterns,
+                       "tokens": len(self.tokens), "nodes": len(self.fail), **meta}, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "SkillMatcher":
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        strings = {}
+        for name in cls.STRINGS:
+            buffer = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            strings[name] = buffer.tobytes().decode("utf-8").split("\n") if buffer.size else []
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(source=meta.get("source", ""), **strings, **arrays)
+
+    @classmethod
+    def load_if_current(cls, directory: str) -> Optional["SkillMatcher"]:
+        """The artifact in `directory`, or None when the datasets it was built from (meta `inputs`) changed since.
+
+        Artifacts without recorded inputs, or whose inputs are not on this machine, are trusted as they are.
+        """
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            inputs = json.load(f).get("inputs")
+        matcher = cls.load(directory)
+        if inputs and all(os.path.exists(path) for path in inputs) and fingerprint(inputs) != matcher.source:
+            logger.warning(f"Skill artifact {directory} is older than {', '.join(inputs)}; rerun convert_skills_csv_to_json.py")
+            return None
+        return matcher
+
+    @classmethod
+    def load_or_build(cls, directory: str, dataset_paths: List[str]) -> "SkillMatcher":
+        """Load the compiled matcher from `directory`, rebuilding it if the datasets changed."""
+        source = fingerprint(dataset_paths)
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            try:
+                matcher = cls.load(directory)
+                if matcher.source == source:
+                    return matcher
+            except Exception as e:
+                logger.warning(f"Rebuilding skill matcher, could not load {directory}: {e}")
+        matcher = cls.from_datasets(dataset_paths)
+        matcher.save(directory)
+        logger.info(f"Compiled {len(matcher)} skills into {directory}")
+        return matcher
+
+    # ==== Matching ====
+    def match_tokens(self, words: List[str]) -> List[str]:
+        """Every skill occurrence in `words` (normalized tokens), in order of their end position."""
+        vocab, goto, fail = self._vocab, self._goto, self._fail
+        output, dict_link, skills = self._output, self._dict_link, self.skills
+        found = []
+        state = 0
+        for word in words:
+            token = vocab.get(word)
+            if token is None:
+                # No skill contains this word: every partial match dies here
+                state = 0
+                continue
+            while True:
+                child = goto(state, token)
+                if child >= 0:
+                    state = child
+                    break
+                if state == 0:
+                    break
+                state = int(fail[state])
+            node = state if output[state] != -1 else int(dict_link[state])
+            while node > 0:
+                found.append(skills[output[node]])
+                node = int(dict_link[node])
+        return found
+
+    def match(self, text: str) -> List[str]:
+        return self.match_tokens(normalize(text).split())
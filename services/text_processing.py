@@ -0,0 +1,41 @@
+import re
+from typing import Iterable, Iterator, List
+
+# Lemmas and stop flags come from the tagger, attribute_ruler and lemmatizer;
+# the dependency parser and NER never change them, so bulk lemmatizing skips both.
+LEMMA_DISABLE = ["parser", "ner"]
+
+PREPROCESS_BATCH_SIZE = 256
+
+
+def clean_text(text: str) -> str:
+    return re.sub(r'[^\w\s]', ' ', text.lower())
+
+
+def lemma_string(doc) -> str:
+    tokens = [
+        token.lemma_ for token in doc
+        if not token.is_stop and len(token) > 2 and not token.is_digit
+    ]
+    return " ".join(tokens)
+
+
+def pipe(nlp, texts: Iterable[str], disable: List[str], batch_size: int = PREPROCESS_BATCH_SIZE,
+         n_process: int = 1) -> Iterator:
+    """nlp.pipe with the given components switched off (names missing from the pipeline are ignored)."""
+    disable = [name for name in disable if name in nlp.pipe_names]
+    return nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+
+
+def lemmatize(nlp, text: str) -> str:
+    """Single-text version of lemmatize_many."""
+    disable = [name for name in LEMMA_DISABLE if name in nlp.pipe_names]
+    return lemma_string(nlp(clean_text(text), disable=disable))
+
+
+def lemmatize_many(nlp, texts: Iterable[str], batch_size: int = PREPROCESS_BATCH_SIZE,
+                   n_process: int = 1) -> List[str]:
+    """Lowercase, strip punctuation, drop stop words/short tokens/digits and lemmatize, in bulk."""
+    docs = pipe(nlp, (clean_text(text) for text in texts), LEMMA_DISABLE, batch_size, n_process)
+    return [lemma_string(doc) for doc in docs]
+
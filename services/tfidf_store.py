@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger("tfidf_store")
+
+
+class TfidfStore:
+    """TF-IDF without a per-request fit: hashed term counts plus persisted document frequencies.
+
+    Terms are hashed into `n_features` columns (HashingVectorizer), so there is no vocabulary
+    to fit. Document frequencies count each post once, by post id: when a post comes back
+    with a different text its old terms are taken out and the new ones added, and posts not
+    seen for `doc_ttl_seconds` (deleted, or no longer sent) are dropped, so IDF follows the
+    catalog as it changes. Weighting matches TfidfVectorizer's defaults: raw counts,
+    smooth idf = ln((1 + n) / (1 + df)) + 1, then L2 rows.
+
+    Term-count rows of posts are kept in a bounded LRU keyed like the embedding cache. The
+    documents (id, text key, last seen, term columns) are saved under `directory` every
+    `save_every` changes and on save(); df is rebuilt from them on load.
+    """
+
+    def __init__(self, directory: str, n_features: int = 2 ** 18, cache_size: int = 10000, save_every: int = 1000,
+                 doc_ttl_seconds: float = 30 * 24 * 3600, prune_interval: float = 3600):
+        self.directory = directory
+        self.n_features = n_features
+        self.cache_size = cache_size
+        self.save_every = save_every
+        self.doc_ttl_seconds = doc_ttl_seconds
+        self.prune_interval = prune_interval
+        self._hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()
+        self.df = np.zeros(n_features, dtype=np.int64)
+        # Post id -> (64-bit prefix of its text key, term columns, last seen)
+        self._docs = {}
+        self._unsaved = 0
+        self._last_prune = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.replaced = 0
+        self.expired = 0
+        self._load()
+
+    @property
+    def n_docs(self) -> int:
+        return len(self._docs)
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"tfidf\0{text}".encode("utf-8")).hexdigest()
+
+    # ==== Persistence ====
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["n_features"] != self.n_features:
+                raise ValueError(f"n_features changed ({meta['n_features']} -> {self.n_features})")
+            if "ids" not in meta:
+                raise ValueError("saved without post ids")
+            columns = np.load(os.path.join(self.directory, "columns.npy"))
+            offsets = np.load(os.path.join(self.directory, "offsets.npy"))
+            self._docs = {
+                doc_id: (text_key, columns[offsets[i]:offsets[i + 1]], last_seen)
+                for i, (doc_id, text_key, last_seen) in enumerate(zip(meta["ids"], meta["text_keys"], meta["last_seen"]))
+            }
+            self.df = np.bincount(columns, minlength=self.n_features).astype(np.int64)
+            logger.info(f"Loaded document frequencies of {self.n_docs} posts from {self.directory}")
+        except Exception as e:
+            logger.warning(f"Discarding TF-IDF statistics at {self.directory}: {e}")
+            self.df = np.zeros(self.n_features, dtype=np.int64)
+            self._docs = {}
+
+    def _save(self):
+        self._prune()
+        os.makedirs(self.directory, exist_ok=True)
+        docs = list(self._docs.items())
+        offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(columns) for _, (_, columns, _) in docs])
+        columns = np.concatenate([columns for _, (_, columns, _) in docs]) if docs else np.empty(0, dtype=np.int32)
+        for name, array in (("columns", columns), ("offsets", offsets)):
+            path = os.path.join(self.directory, f"{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(path + ".tmp", path)
+        with open(self._meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "n_features": self.n_features,
+                "ids": [doc_id for doc_id, _ in docs],
+                "text_keys": [text_key for _, (text_key, _, _) in docs],
+                "last_seen": [last_seen for _, (_, _, last_seen) in docs],
+            }, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+        self._unsaved = 0
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    # ==== Documents ====
+    def _prune(self):
+        """Drop posts not seen for doc_ttl_seconds from the document frequencies."""
+        now = time.time()
+        self._last_prune = now
+        if self.doc_ttl_seconds <= 0:
+            return
+        expired = [doc_id for doc_id, (_, _, last_seen) in self._docs.items() if now - last_seen > self.doc_ttl_seconds]
+        for doc_id in expired:
+            self.df[self._docs.pop(doc_id)[1]] -= 1
+        self.expired += len(expired)
+        self._unsaved += len(expired)
+
+    # ==== Counts ====
+    def _count(self, texts: List[str]) -> List[tuple]:
+        counts = self._hasher.transform(texts).tocsr()
+        counts.sum_duplicates()
+        return [
+            (counts.indices[start:end].copy(), counts.data[start:end].copy())
+            for start, end in zip(counts.indptr[:-1], counts.indptr[1:])
+        ]
+
+    def _stack(self, rows: List[tuple]) -> csr_matrix:
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(indices) for indices, _ in rows])
+        indices = np.concatenate([indices for indices, _ in rows]) if rows else np.empty(0, dtype=np.int32)
+        data = np.concatenate([data for _, data in rows]) if rows else np.empty(0)
+        return csr_matrix((data, indices, indptr), shape=(len(rows), self.n_features))
+
+    def counts(self, texts: List[str], doc_ids: Optional[List[str]] = None) -> csr_matrix:
+        """Term counts of post texts; new or changed posts update the document frequencies.
+
+        `doc_ids` identify the posts behind the texts; without them a text is its own post
+        (so an edited post counts twice until the old text expires).
+        """
+        keys = [self.key(text) for text in texts]
+        doc_ids = keys if doc_ids is None else doc_ids
+        rows = [None] * len(texts)
+        missing = OrderedDict()
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is not None:
+                    self._rows.move_to_end(key)
+                    self.hits += 1
+                    rows[i] = row
+                else:
+                    missing.setdefault(key, []).append(i)
+
+        if missing:
+            counted = self._count([texts[positions[0]] for positions in missing.values()])
+            for positions, row in zip(missing.values(), counted):
+                for i in positions:
+                    rows[i] = row
+
+        with self._lock:
+            self.misses += len(missing)
+            for key, row in zip(missing, counted if missing else []):
+                self._rows[key] = row
+            while len(self._rows) > self.cache_size:
+                self._rows.popitem(last=False)
+
+            now = time.time()
+            for doc_id, key, row in zip(doc_ids, keys, rows):
+                text_key = int(key[:16], 16)
+                doc = self._docs.get(doc_id)
+                if doc is not None and doc[0] == text_key:
+                    self._docs[doc_id] = (text_key, doc[1], now)
+                    continue
+                if doc is not None:
+                    self.df[doc[1]] -= 1
+                    self.replaced += 1
+                self.df[row[0]] += 1
+                self._docs[doc_id] = (text_key, row[0], now)
+                self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+            elif now - self._last_prune >= self.prune_interval:
+                self._prune()
+
+        return self._stack(rows)
+
+    # ==== TF-IDF ====
+    def idf(self) -> np.ndarray:
+        return np.log((1 + self.n_docs) / (1 + self.df)) + 1
+
+    def weight(self, counts: csr_matrix, idf: np.ndarray) -> csr_matrix:
+        return normalize(counts @ diags(idf), norm="l2", copy=False).tocsr()
+
+    def transform(self, query: str, texts: List[str], doc_ids: Optional[List[str]] = None):
+        """(query row, post rows) as L2-normalized TF-IDF; the query does not count as a document."""
+        post_counts = self.counts(texts, doc_ids)
+        query_counts = self._stack(self._count([query]))
+        with self._lock:
+            idf = self.idf()
+        return self.weight(query_counts, idf), self.weight(post_counts, idf)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "documents": self.n_docs,
+                "hits": self.hits,
+                "misses": self.misses,
+                "replaced": self.replaced,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "cached_rows": len(self._rows),
+                "cache_size": self.cache_size,
+            }
@@ -0,0 +1,159 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from services.quantized_store import cosine_similarities
+
+logger = logging.getLogger("vector_index")
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting everything."""
+    if k >= scores.shape[0]:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class ExactIndex:
+    """Brute-force cosine search; the reference every other index is measured against."""
+
+    def set_rows(self, positions: np.ndarray, vectors: np.ndarray):
+        pass
+
+    def move(self, source: int, target: int):
+        pass
+
+    def truncate(self, size: int):
+        pass
+
+    def reset(self):
+        pass
+
+    def maybe_train(self, vectors: np.ndarray):
+        pass
+
+    def search(self, query: np.ndarray, vectors: np.ndarray, k: int) -> np.ndarray:
+        return top_k_indices(cosine_similarities(vectors, query), k)
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means centroids + one list id per row.
+
+    Search scores the query against the centroids, keeps the `n_probe` closest lists and
+    only computes exact cosines for rows assigned to those lists.
+    Rows are addressed by position in the caller's matrix (a float32 array or a
+    QuantizedMatrix); the caller reports changes through set_rows / move / truncate so
+    the index never copies the vectors.
+    Recall/latency trade-off: more `n_lists` = smaller lists (faster, lower recall at a
+    fixed `n_probe`); more `n_probe` = more lists scanned (slower, higher recall).
+    """
+
+    def __init__(self, n_lists: int = 0, n_probe: int = 8, train_iterations: int = 10,
+                 min_train_size: int = 1000, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+
+    # ==== Training ====
+    def _list_count(self, size: int) -> int:
+        return self.n_lists or max(1, int(np.sqrt(size)))
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self, vectors: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        n_lists = min(self._list_count(vectors.shape[0]), vectors.shape[0])
+        # k-means on a sample is enough to place the centroids
+        sample_size = min(vectors.shape[0], 256 * n_lists)
+        sample = normalize_rows(vectors[rng.choice(vectors.shape[0], sample_size, replace=False)])
+        self.centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            labels = self._assign(sample)
+            order = np.argsort(labels, kind="stable")
+            lists, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(self.centroids)
+            sums[lists] = np.add.reduceat(sample[order], starts, axis=0)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            self.centroids = normalize_rows(sums)
+
+        self.assignments = self._assign(vectors)
+        self.trained_size = vectors.shape[0]
+        logger.info(f"Trained IVF index: {n_lists} lists over {vectors.shape[0]} vectors")
+
+    def maybe_train(self, vectors: np.ndarray):
+        # Retrain once the catalog has doubled, so lists stay balanced as it grows
+        size = vectors.shape[0]
+        if size >= self.min_train_size and (self.centroids is None or size > 2 * self.trained_size):
+            self.train(vectors)
+
+    # ==== Row updates ====
+    def set_rows(self, positions: np.ndarray, vectors: np.ndarray):
+        if self.centroids is None:
+            return
+        positions = np.asarray(positions)
+        needed = int(positions.max()) + 1 if positions.size else 0
+        if needed > self.assignments.shape[0]:
+            self.assignments = np.concatenate([
+                self.assignments, np.zeros(needed - self.assignments.shape[0], dtype=np.int32)
+            ])
+        self.assignments[positions] = self._assign(np.asarray(vectors, dtype=np.float32))
+
+    def move(self, source: int, target: int):
+        if self.centroids is not None:
+            self.assignments[target] = self.assignments[source]
+
+    def truncate(self, size: int):
+        if self.centroids is not None:
+            self.assignments = self.assignments[:size]
+
+    def reset(self):
+        # Centroids of vectors that were discarded, e.g. after an encoder change
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+
+    # ==== Search ====
+    def search(self, query: np.ndarray, vectors: np.ndarray, k: int) -> np.ndarray:
+        if self.centroids is None or self.assignments.shape[0] != vectors.shape[0]:
+            return ExactIndex().search(query, vectors, k)
+        centroid_scores = self.centroids @ query
+        probed = top_k_indices(centroid_scores, min(self.n_probe, self.centroids.shape[0]))
+        candidates = np.flatnonzero(np.isin(self.assignments, probed))
+        if candidates.size == 0:
+            return candidates
+        scores = cosine_similarities(vectors, query, candidates)
+        return candidates[top_k_indices(scores, k)]
+
+
+INDEX_TYPES = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def make_index(kind: str, **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](**params)
@@ -1,27 +1,100 @@
-import spacy
-from spacy.matcher import PhraseMatcher
-import json
+import multiprocessing
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List
+from services.model_registry import load_once, on_warm_up
+from services.skill_matcher import SkillMatcher, normalize
 
-nlp = spacy.load("en_core_web_sm")
+# Artifact written by convert_skills_csv_to_json.py, memory-mapped when present and built from the current datasets
+SKILL_ARTIFACT_DIR = os.getenv("SKILL_ARTIFACT_DIR", "./skills-dataset/compiled")
+# Otherwise the JSON datasets are compiled once into SKILL_MATCHER_PATH and rebuilt when they change
+SKILL_DATASET_PATHS = os.getenv(
+    "SKILL_DATASET_PATHS", "./skills-dataset/kaggle_skills.json,./skills-dataset/esco_skills.json"
+).split(",")
+SKILL_MATCHER_PATH = os.getenv("SKILL_MATCHER_PATH", "./cache/skill_matcher")
 
-def normalize(skill):
-    return re.sub(r"[^\w\s]", "", skill.lower().strip())
+# Batch extraction: texts per chunk, and worker processes (0/1 = in the calling process)
+SKILL_BATCH_CHUNK_SIZE = int(os.getenv("SKILL_BATCH_CHUNK_SIZE", "256"))
+SKILL_BATCH_WORKERS = int(os.getenv("SKILL_BATCH_WORKERS", "0"))
 
-with open("./skills-dataset/kaggle_skills.json", encoding="utf-8") as f:
-    raw_skills = json.load(f)
+def load_matcher():
+    if os.path.exists(os.path.join(SKILL_ARTIFACT_DIR, "meta.json")):
+        matcher = SkillMatcher.load_if_current(SKILL_ARTIFACT_DIR)
+        if matcher is not None:
+            return matcher
+    # Stale (or no) artifact: compile the datasets, reusing the last compile while they are unchanged
+    return SkillMatcher.load_or_build(SKILL_MATCHER_PATH, SKILL_DATASET_PATHS)
 
-normalized_skills = list(set(normalize(skill) for skill in raw_skills if len(skill) > 1))
-patterns = [nlp.make_doc(skill) for skill in normalized_skills]
-matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
-matcher.add("SKILLS", patterns)
+def get_matcher():
+    return load_once("skill_matcher", load_matcher)
+
+@on_warm_up
+def warm_up_skill_extractor():
+    get_matcher()
 
 def extract_skills_from_text(text):
-    doc = nlp(normalize(text))
-    matches = matcher(doc)
-    extracted = [doc[start:end].text.lower() for _, start, end in matches]
+    extracted = get_matcher().match(text)
     return sorted(set(s for s in extracted if len(s) > 2 and not re.fullmatch(r"[a-z]", s)))
 
+# ==== Batch extraction ====
+_process_pool = None
+
+def extract_skills_chunk(texts: List[str]) -> List[List[str]]:
+    return [extract_skills_from_text(text) for text in texts]
+
+def chunked(texts: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    iterator = iter(texts)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def make_process_pool(n_workers: int) -> ProcessPoolExecutor:
+    # spawn, not fork: the server process has threads (and possibly locks held by them)
+    return ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context("spawn"), initializer=get_matcher)
+
+def get_process_pool():
+    """The server's shared worker pool, or None when SKILL_BATCH_WORKERS <= 1."""
+    global _process_pool
+    if SKILL_BATCH_WORKERS > 1 and _process_pool is None:
+        _process_pool = make_process_pool(SKILL_BATCH_WORKERS)
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+def extract_skills_batch(texts: Iterable[str], chunk_size: int = SKILL_BATCH_CHUNK_SIZE,
+                         n_workers: int = SKILL_BATCH_WORKERS) -> Iterator[List[str]]:
+    """Skills of every text, yielded in input order.
+
+    `texts` is consumed lazily in chunks; with n_workers > 1 the chunks run on a process
+    pool with at most 2 * n_workers of them in flight, so memory stays bounded by the
+    chunk size whatever the input size.
+    """
+    if n_workers <= 1:
+        for chunk in chunked(texts, chunk_size):
+            yield from extract_skills_chunk(chunk)
+        return
+
+    executor = make_process_pool(n_workers)
+    try:
+        pending = deque()
+        for chunk in chunked(texts, chunk_size):
+            pending.append(executor.submit(extract_skills_chunk, chunk))
+            if len(pending) >= 2 * n_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
 
 
 
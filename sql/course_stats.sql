@@ -0,0 +1,39 @@
+-- Per-course stats for the course recommender (services/course_index.py).
+--
+-- Contents and reviews are aggregated separately and then joined, one row per course.
+-- Joining both tables to courses before GROUP BY multiplies every content row by every
+-- review, which inflates the video minutes and lesson counts.
+--
+-- Apply once, e.g.: psql -d CareerK -f sql/course_stats.sql
+-- Refresh with: REFRESH MATERIALIZED VIEW CONCURRENTLY course_stats;
+-- The course index does this before each refresh when COURSE_STATS_VIEW=1.
+
+-- Each aggregate reads only its index (index-only scans once the tables are vacuumed)
+CREATE INDEX IF NOT EXISTS course_contents_course_id_idx
+    ON course_contents (course_id) INCLUDE (type, video_time_minutes);
+CREATE INDEX IF NOT EXISTS course_reviews_course_id_idx
+    ON course_reviews (course_id) INCLUDE (rating);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS course_stats AS
+SELECT
+    c.id AS course_id,
+    COALESCE(cc.total_video_minutes, 0) AS total_video_minutes,
+    COALESCE(cc.total_lessons, 0) AS total_lessons,
+    cr.average_rating
+FROM courses c
+LEFT JOIN (
+    SELECT
+        course_id,
+        SUM(video_time_minutes) FILTER (WHERE type = 'video') AS total_video_minutes,
+        COUNT(*) FILTER (WHERE type IN ('video', 'quiz')) AS total_lessons
+    FROM course_contents
+    GROUP BY course_id
+) cc ON cc.course_id = c.id
+LEFT JOIN (
+    SELECT course_id, ROUND(AVG(rating)::numeric, 1) AS average_rating
+    FROM course_reviews
+    GROUP BY course_id
+) cr ON cr.course_id = c.id;
+
+-- Required by REFRESH ... CONCURRENTLY, which keeps the view readable while it refreshes
+CREATE UNIQUE INDEX IF NOT EXISTS course_stats_course_id_idx ON course_stats (course_id);
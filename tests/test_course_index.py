@@ -0,0 +1,180 @@
+import asyncio
+import zlib
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import numpy as np
+
+from services.course_index import CourseIndex, KeywordIndex
+
+
+class FakeConnection:
+    """asyncpg stand-in answering the queries of CourseIndex._fetch from a list of course rows."""
+
+    def __init__(self, courses, has_updated_at: bool = False):
+        self.courses = courses
+        self.has_updated_at = has_updated_at
+
+    async def fetchval(self, query, *args):
+        return self.has_updated_at
+
+    async def fetch(self, query, *args):
+        if "SELECT id FROM courses" in query:
+            return [{"id": course["id"]} for course in self.courses]
+        if "course_contents" in query:
+            return [{"id": course["id"], "total_video_minutes": 10, "total_lessons": 2, "average_rating": 4.5}
+                    for course in self.courses]
+        rows = [dict(course, updated_at=course.get("updated_at") if self.has_updated_at else None)
+                for course in self.courses]
+        if args:
+            watermark, unseen = args
+            rows = [row for row in rows if row["updated_at"] > watermark or str(row["id"]) in unseen]
+        return rows
+
+
+class CountingEncoder:
+    """Deterministic unit vector per text; records the texts it was asked to encode."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([self.vector(text) for text in texts])
+
+    @staticmethod
+    def vector(text: str) -> np.ndarray:
+        vector = np.random.default_rng(zlib.crc32(text.encode())).normal(size=8).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+def course(course_id: int, description: str = "", **fields) -> dict:
+    return {"id": course_id, "name": f"Course {course_id}", "description": description or f"about {course_id}",
+            "image_url": None, "track_id": None, **fields}
+
+
+def refresh(index: CourseIndex, conn: FakeConnection, full: bool = False) -> dict:
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    return asyncio.run(index.refresh(acquire, full))
+
+
+def assert_vectors_match_texts(index: CourseIndex):
+    expected = np.stack([CountingEncoder.vector(course["text"]) for course in index.courses])
+    np.testing.assert_allclose(index.vectors.dequantize(), expected, rtol=1e-6)
+
+
+def test_refresh_without_changes_does_not_encode(tmp_path):
+    encoder = CountingEncoder()
+    index = CourseIndex(str(tmp_path), encoder)
+    conn = FakeConnection([course(1), course(2), course(3)])
+    refresh(index, conn)
+
+    result = refresh(index, conn)
+
+    assert len(encoder.calls) == 1
+    assert result["encoded"] == 0 and result["total"] == 3
+    assert_vectors_match_texts(index)
+
+
+def test_only_changed_and_new_texts_are_encoded(tmp_path):
+    encoder = CountingEncoder()
+    index = CourseIndex(str(tmp_path), encoder)
+    conn = FakeConnection([course(1), course(2), course(3)])
+    refresh(index, conn)
+
+    conn.courses = [course(1), course(2, "rewritten"), course(3), course(4)]
+    result = refresh(index, conn)
+
+    assert encoder.calls[-1] == ["Course 2 rewritten", "Course 4 about 4"]
+    assert result == {"changed": 4, "encoded": 2, "deleted": 0, "total": 4}
+    assert_vectors_match_texts(index)
+
+
+def test_deleted_courses_are_dropped(tmp_path):
+    index = CourseIndex(str(tmp_path), CountingEncoder())
+    conn = FakeConnection([course(1), course(2), course(3)])
+    refresh(index, conn)
+
+    conn.courses = [course(1), course(3)]
+    result = refresh(index, conn)
+
+    assert result["deleted"] == 1
+    assert [c["course_id"] for c in index.courses] == ["1", "3"]
+    assert_vectors_match_texts(index)
+
+
+def test_watermark_limits_the_fetch(tmp_path):
+    encoder = CountingEncoder()
+    index = CourseIndex(str(tmp_path), encoder)
+    day = lambda n: datetime(2024, 1, n)
+    conn = FakeConnection([course(1, updated_at=day(1)), course(2, updated_at=day(2))], has_updated_at=True)
+    refresh(index, conn)
+
+    conn.courses = [course(1, updated_at=day(1)), course(2, "rewritten", updated_at=day(3))]
+    result = refresh(index, conn)
+
+    assert result["changed"] == 1 and encoder.calls[-1] == ["Course 2 rewritten"]
+    assert index.watermark == datetime(2024, 1, 3)
+
+
+def test_other_fingerprint_re_encodes_everything(tmp_path):
+    conn = FakeConnection([course(1), course(2)])
+    refresh(CourseIndex(str(tmp_path), CountingEncoder(), fingerprint=lambda: "model@fp32:a"), conn)
+
+    encoder = CountingEncoder()
+    index = CourseIndex(str(tmp_path), encoder, fingerprint=lambda: "model@fp32:b")
+    result = refresh(index, conn)
+
+    assert result["encoded"] == 2 and index.fingerprint == "model@fp32:b"
+
+
+def test_reload_then_refresh_without_changes(tmp_path):
+    conn = FakeConnection([course(1), course(2)])
+    refresh(CourseIndex(str(tmp_path), CountingEncoder(), dtype="int8"), conn)
+
+    encoder = CountingEncoder()
+    index = CourseIndex(str(tmp_path), encoder, dtype="int8")
+    refresh(index, conn)
+
+    assert encoder.calls == [] and len(index) == 2
+    assert index.courses[0]["average_rating"] == 4.5
+
+
+# ==== KeywordIndex ====
+def keyword_counts(texts, keywords):
+    return KeywordIndex(texts).count_matches(keywords).tolist()
+
+
+def test_keywords_match_whole_words_only():
+    assert keyword_counts(["Java and Python", "JavaScript basics"], ["java"]) == [1, 0]
+    assert keyword_counts(["Intro to R", "Rust for rookies"], ["r"]) == [1, 0]
+
+
+def test_plus_and_hash_are_part_of_the_word():
+    texts = ["Modern C++ in depth", "C# for Unity", "C programming"]
+
+    assert keyword_counts(texts, ["c++"]) == [1, 0, 0]
+    assert keyword_counts(texts, ["C#"]) == [0, 1, 0]
+    assert keyword_counts(texts, ["c"]) == [0, 0, 1]
+
+
+def test_multi_word_keywords_must_appear_as_a_phrase():
+    texts = ["Machine learning with Python", "Learning to use a sewing machine"]
+
+    assert keyword_counts(texts, ["machine learning"]) == [1, 0]
+
+
+def test_punctuated_keywords_are_confirmed_verbatim():
+    texts = ["ASP.NET Core web APIs", "Net promoter score", "Node.js servers", "Node and JS graphs"]
+
+    assert keyword_counts(texts, [".net"]) == [1, 0, 0, 0]
+    assert keyword_counts(texts, ["node.js"]) == [0, 0, 1, 0]
+
+
+def test_each_keyword_counts_once_per_course():
+    texts = ["Python, python and more Python for data science", "SQL only"]
+
+    assert keyword_counts(texts, ["python", "data science", "sql", " SQL ", "!!"]) == [2, 2]
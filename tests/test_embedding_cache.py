@@ -0,0 +1,149 @@
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    """encode_fn stand-in: a text's vector is (its length, its number, 1); records what it was asked for."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), float(text.split()[-1]), 1] for text in texts], dtype=np.float32)
+
+
+def texts(start: int, count: int):
+    return [f"post {i}" for i in range(start, start + count)]
+
+
+def make_cache(tmp_path, **kwargs) -> EmbeddingCache:
+    return EmbeddingCache("test-model", str(tmp_path), **kwargs)
+
+
+def test_second_lookup_does_not_encode(tmp_path):
+    cache, encoder = make_cache(tmp_path), CountingEncoder()
+
+    first = cache.encode(texts(0, 3), encoder)
+    second = cache.encode(texts(0, 3), encoder)
+
+    np.testing.assert_array_equal(first, second)
+    assert encoder.calls == [texts(0, 3)]
+    assert cache.hits_memory == 3
+
+
+def test_duplicates_in_one_call_are_encoded_once(tmp_path):
+    cache, encoder = make_cache(tmp_path), CountingEncoder()
+
+    vectors = cache.encode(["post 1", "post 2", "post 1"], encoder)
+
+    assert encoder.calls == [["post 1", "post 2"]]
+    np.testing.assert_array_equal(vectors[0], vectors[2])
+
+
+def test_memory_evictions_are_served_from_disk(tmp_path):
+    cache, encoder = make_cache(tmp_path, memory_size=2), CountingEncoder()
+    cache.encode(texts(0, 5), encoder)
+    assert cache.evictions_memory == 3
+
+    vectors = cache.encode(texts(0, 2), encoder)
+
+    assert len(encoder.calls) == 1 and cache.hits_disk == 2
+    np.testing.assert_array_equal(vectors, CountingEncoder()(texts(0, 2)))
+
+
+def test_disk_slots_are_reused_oldest_first(tmp_path):
+    cache, encoder = make_cache(tmp_path, memory_size=1, disk_size=3), CountingEncoder()
+    cache.encode(texts(0, 4), encoder)
+
+    cache.encode(["post 0", "post 3"], encoder)
+
+    # post 0's slot went to post 3, so only post 0 is encoded again
+    assert encoder.calls[-1] == ["post 0"]
+    assert cache.evictions_disk == 2
+
+
+def test_reload_from_disk(tmp_path):
+    make_cache(tmp_path).encode(texts(0, 4), CountingEncoder())
+
+    cache, encoder = make_cache(tmp_path), CountingEncoder()
+    vectors = cache.encode(texts(0, 4), encoder)
+
+    assert encoder.calls == [] and cache.hits_disk == 4
+    np.testing.assert_array_equal(vectors, CountingEncoder()(texts(0, 4)))
+
+
+def test_reload_after_compaction_keeps_the_fifo_order(tmp_path):
+    cache = make_cache(tmp_path, memory_size=1, disk_size=3)
+    for i in range(8):
+        cache.encode([f"post {i}"], CountingEncoder())
+
+    reloaded, encoder = make_cache(tmp_path, memory_size=1, disk_size=3), CountingEncoder()
+    reloaded.encode(texts(5, 3), encoder)
+    assert encoder.calls == []
+
+    # post 5 was the oldest, so post 8 takes its slot
+    reloaded.encode(["post 8"], encoder)
+    reloaded.encode(["post 6", "post 5"], encoder)
+    assert encoder.calls == [["post 8"], ["post 5"]]
+
+
+def test_capacity_change_discards_the_cache(tmp_path):
+    make_cache(tmp_path, disk_size=10).encode(texts(0, 2), CountingEncoder())
+
+    cache, encoder = make_cache(tmp_path, disk_size=20), CountingEncoder()
+    cache.encode(texts(0, 2), encoder)
+
+    assert encoder.calls == [texts(0, 2)]
+
+
+def test_fingerprint_change_misses(tmp_path):
+    make_cache(tmp_path, fingerprint=lambda: "model@fp32:a").encode(texts(0, 2), CountingEncoder())
+
+    cache, encoder = make_cache(tmp_path, fingerprint=lambda: "model@fp32:b"), CountingEncoder()
+    cache.encode(texts(0, 2), encoder)
+
+    assert encoder.calls == [texts(0, 2)]
+
+
+# ==== Shared directory (several workers) ====
+def test_two_caches_on_one_directory_never_return_each_others_vectors(tmp_path):
+    first = make_cache(tmp_path, memory_size=1, disk_size=4)
+    second = make_cache(tmp_path, memory_size=1, disk_size=4)
+    encoder = CountingEncoder()
+
+    # Interleaved writes: each one has to allocate after the other's slots
+    for i in range(10):
+        first.encode([f"post {i}"], encoder)
+        second.encode([f"post {100 + i}"], encoder)
+
+    for cache in (first, second):
+        for text in texts(6, 4) + texts(106, 4):
+            np.testing.assert_array_equal(cache.encode([text], encoder)[0], CountingEncoder()([text])[0])
+
+
+def test_vectors_written_by_another_cache_are_disk_hits(tmp_path):
+    writer = make_cache(tmp_path)
+    reader, encoder = make_cache(tmp_path), CountingEncoder()
+    reader.encode(["post 0"], encoder)
+
+    writer.encode(texts(1, 3), CountingEncoder())
+    reader.encode(texts(1, 3), encoder)
+
+    assert encoder.calls == [["post 0"]] and reader.hits_disk == 3
+
+
+def test_row_reused_by_another_cache_is_a_miss(tmp_path):
+    stale = make_cache(tmp_path, memory_size=1, disk_size=2)
+    stale.encode(texts(0, 2), CountingEncoder())
+    stale.encode(["post 9"], CountingEncoder())
+
+    # Another worker reuses post 1's slot; `stale` still maps post 1 to it
+    make_cache(tmp_path, memory_size=1, disk_size=2).encode(["post 5"], CountingEncoder())
+    stale._sync = lambda: None
+    encoder = CountingEncoder()
+    vector = stale.encode(["post 1"], encoder)[0]
+
+    assert encoder.calls == [["post 1"]] and stale.stale_disk == 1
+    np.testing.assert_array_equal(vector, CountingEncoder()(["post 1"])[0])
@@ -0,0 +1,171 @@
+import re
+
+import numpy as np
+import pytest
+
+from services.encoding import bucketed_batches, encode_texts, passage_spans, settings_fingerprint
+
+
+class FakeTokenizer:
+    """One token per whitespace-separated word, like a fast tokenizer's offset mapping."""
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False, truncation=False, verbose=False):
+        offsets = [[match.span() for match in re.finditer(r"\S+", text)] for text in texts]
+        return {"input_ids": [list(range(len(spans))) for spans in offsets], "offset_mapping": offsets}
+
+
+class FakeModel:
+    """Sentence-transformers stand-in: a text's vector is (words, sum of its numeric words, 1)."""
+
+    def __init__(self, max_seq_length: int = 10):
+        self.max_seq_length = max_seq_length
+        self.tokenizer = FakeTokenizer()
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 3
+
+    def vector(self, text: str) -> np.ndarray:
+        words = text.split()[:self.max_seq_length - 2]
+        return np.array([len(words), sum(int(word) for word in words), 1], dtype=np.float32)
+
+    def encode(self, texts, batch_size=32):
+        self.batches.append(list(texts))
+        return np.stack([self.vector(text) for text in texts])
+
+
+def numbers(start: int, count: int) -> str:
+    return " ".join(str(i) for i in range(start, start + count))
+
+
+# ==== passage_spans ====
+def test_short_text_is_one_passage():
+    offsets = [(0, 3), (4, 7), (8, 10)]
+    assert passage_spans(offsets, max_tokens=5, stride=2) == [(0, 10, 3)]
+
+
+def test_empty_text_is_one_empty_passage():
+    assert passage_spans([], max_tokens=5, stride=2) == [(0, 0, 0)]
+
+
+def test_long_text_passages_overlap_by_stride():
+    offsets = [(2 * i, 2 * i + 1) for i in range(10)]
+
+    spans = passage_spans(offsets, max_tokens=4, stride=1)
+
+    # Passages start every 3 tokens (tokens 0-3, 3-6, 6-9); the third one reaches the end
+    assert spans == [(0, 7, 4), (6, 13, 4), (12, 19, 4)]
+
+
+def test_passages_cover_every_token_once_the_last_one_ends():
+    offsets = [(i, i + 1) for i in range(23)]
+
+    spans = passage_spans(offsets, max_tokens=8, stride=3)
+
+    assert spans[0][0] == 0 and spans[-1][1] == 23
+    assert all(n_tokens <= 8 for _, _, n_tokens in spans)
+    assert all(later[0] < earlier[1] for earlier, later in zip(spans, spans[1:]))
+
+
+def test_stride_at_least_max_tokens_still_advances():
+    offsets = [(i, i + 1) for i in range(5)]
+    assert len(passage_spans(offsets, max_tokens=2, stride=5)) == 4
+
+
+# ==== bucketed_batches ====
+def test_batches_cover_every_position_once_shortest_first():
+    lengths = np.array([50, 3, 20, 3, 7, 50, 12])
+
+    batches = bucketed_batches(lengths, max_batch_size=3, token_budget=1000)
+
+    order = np.concatenate(batches)
+    assert sorted(order.tolist()) == list(range(len(lengths)))
+    assert np.all(np.diff(lengths[order]) >= 0)
+
+
+@pytest.mark.parametrize("max_batch_size, token_budget", [(4, 10_000), (32, 64), (2, 30)])
+def test_batches_respect_size_and_token_budget(max_batch_size, token_budget):
+    lengths = np.random.default_rng(0).integers(1, 40, size=100)
+
+    for batch in bucketed_batches(lengths, max_batch_size, token_budget):
+        assert len(batch) <= max_batch_size
+        assert len(batch) == 1 or len(batch) * lengths[batch].max() <= token_budget
+
+
+def test_text_over_the_budget_gets_its_own_batch():
+    batches = bucketed_batches(np.array([5, 500, 5]), max_batch_size=8, token_budget=100)
+    assert [sorted(batch.tolist()) for batch in batches] == [[0, 2], [1]]
+
+
+def test_no_lengths_no_batches():
+    assert bucketed_batches(np.array([], dtype=np.int64), 8, 100) == []
+
+
+# ==== encode_texts ====
+def test_vectors_come_back_in_input_order():
+    model = FakeModel(max_seq_length=10)
+    texts = [numbers(0, 6), numbers(10, 1), numbers(20, 3)]
+
+    vectors = encode_texts(model, texts, batch_size=2, token_budget=1000)
+
+    np.testing.assert_array_equal(vectors, np.stack([model.vector(text) for text in texts]))
+
+
+def test_model_calls_follow_the_buckets():
+    model = FakeModel(max_seq_length=50)
+    texts = [numbers(0, n) for n in (30, 2, 30, 2, 2)]
+
+    encode_texts(model, texts, batch_size=8, token_budget=40)
+
+    # Lengths include the 2 special tokens: the short texts fit together, the long ones one by one
+    assert sorted(len(batch) for batch in model.batches) == [1, 1, 3]
+
+
+def test_long_text_is_pooled_over_passages():
+    model = FakeModel(max_seq_length=6)
+    text = numbers(0, 11)
+
+    vector = encode_texts(model, [text], split_long=True, stride=1)[0]
+
+    # max_tokens = 4, step 3: tokens 0-3, 3-6, 6-9 and 9-10, weighted by their token counts
+    passages = [numbers(0, 4), numbers(3, 4), numbers(6, 4), numbers(9, 2)]
+    weights = np.array([4, 4, 4, 2], dtype=np.float32)
+    expected = (np.stack([model.vector(p) for p in passages]) * weights[:, None]).sum(axis=0) / weights.sum()
+    np.testing.assert_allclose(vector, expected, rtol=1e-6)
+
+
+def test_without_splitting_long_texts_are_truncated():
+    model = FakeModel(max_seq_length=6)
+    texts = [numbers(0, 10), numbers(0, 2)]
+
+    vectors = encode_texts(model, texts, split_long=False)
+
+    assert model.batches == [texts[::-1]]
+    np.testing.assert_array_equal(vectors[0], model.vector(texts[0]))
+
+
+def test_mixed_short_and_long_texts():
+    model = FakeModel(max_seq_length=6)
+    texts = [numbers(0, 2), numbers(0, 10), numbers(5, 3)]
+
+    vectors = encode_texts(model, texts, split_long=True, stride=1)
+
+    np.testing.assert_array_equal(vectors[0], model.vector(texts[0]))
+    np.testing.assert_array_equal(vectors[2], model.vector(texts[2]))
+    assert vectors[1][2] == pytest.approx(1.0)
+
+
+def test_no_texts():
+    vectors = encode_texts(FakeModel(), [])
+    assert vectors.shape == (0, 3) and vectors.dtype == np.float32
+
+
+def test_settings_fingerprint_tracks_what_changes_vectors():
+    model = FakeModel(max_seq_length=10)
+    base = settings_fingerprint(model, split_long=True, stride=32)
+
+    assert settings_fingerprint(model, split_long=True, stride=16) != base
+    assert settings_fingerprint(model, split_long=False, stride=32) != base
+    assert settings_fingerprint(FakeModel(max_seq_length=20), split_long=True, stride=32) != base
+    # The stride only matters when texts are split
+    assert settings_fingerprint(model, False, 32) == settings_fingerprint(model, False, 16)
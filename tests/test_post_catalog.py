@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from services.post_catalog import PostCatalog
+from services.vector_index import IVFIndex, normalize_rows
+
+
+def post_vectors(n: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return normalize_rows(np.random.default_rng(seed).normal(size=(n, dim))).astype(np.float32)
+
+
+def upsert(catalog: PostCatalog, ids, vectors):
+    catalog.upsert(ids, vectors, [[(post_id,)] for post_id in ids], [(i, i + 1) for i in range(len(ids))])
+
+
+def closest(catalog: PostCatalog, query: np.ndarray) -> str:
+    ids, scores, _, _ = catalog.search(query, n_candidates=len(catalog))
+    return ids[int(np.argmax(scores))]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_upsert_replaces_existing_posts(tmp_path, dtype):
+    catalog = PostCatalog("jobs", str(tmp_path), dtype=dtype)
+    vectors = post_vectors(4)
+    upsert(catalog, ["a", "b", "c"], vectors[:3])
+
+    upsert(catalog, ["b"], vectors[3:])
+
+    assert catalog.ids == ["a", "b", "c"]
+    assert closest(catalog, vectors[3]) == "b"
+
+
+def test_post_repeated_in_a_batch_keeps_its_last_occurrence(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path))
+    vectors = post_vectors(2)
+
+    catalog.upsert(["a", "a"], vectors, [[("first",)], [("last",)]], [(0, 1), (2, 3)])
+
+    assert catalog.ids == ["a"] and catalog.skill_tokens == [[("last",)]] and catalog.experience == [(2, 3)]
+    assert closest(catalog, vectors[1]) == "a"
+
+
+def test_buffer_grows_with_spare_rows(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path))
+    vectors = post_vectors(100)
+
+    for i in range(100):
+        upsert(catalog, [f"p{i}"], vectors[i:i + 1])
+
+    # Doubling: far fewer reallocations than upserts
+    assert len(catalog.vectors) == 100 and len(catalog._buffer) == 128
+    assert all(closest(catalog, vectors[i]) == f"p{i}" for i in (0, 50, 99))
+
+
+def test_delete_moves_the_last_post_into_the_freed_row(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path))
+    vectors = post_vectors(5)
+    upsert(catalog, ["a", "b", "c", "d", "e"], vectors)
+
+    assert catalog.delete(["b", "missing", "d"]) == 2
+
+    assert sorted(catalog.ids) == ["a", "c", "e"] and len(catalog.vectors) == 3
+    for post_id, vector in zip("ace", vectors[[0, 2, 4]]):
+        assert closest(catalog, vector) == post_id
+        assert catalog.skill_tokens[catalog.ids.index(post_id)] == [(post_id,)]
+
+
+def test_delete_everything_then_upsert(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path))
+    vectors = post_vectors(3)
+    upsert(catalog, ["a", "b"], vectors[:2])
+
+    catalog.delete(["a", "b"])
+    assert catalog.vectors is None and catalog.search(vectors[0], 5)[0] == []
+
+    upsert(catalog, ["c"], vectors[2:])
+    assert catalog.ids == ["c"] and closest(catalog, vectors[2]) == "c"
+
+
+def test_ivf_index_follows_updates(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path), index=IVFIndex(n_lists=4, n_probe=4, min_train_size=50))
+    vectors = post_vectors(120)
+    upsert(catalog, [f"p{i}" for i in range(100)], vectors[:100])
+    upsert(catalog, [f"p{i}" for i in range(100, 120)], vectors[100:])
+    catalog.delete(["p3", "p50"])
+
+    ids, _, _, _ = catalog.search(vectors[119], n_candidates=5)
+    assert ids[0] == "p119"
+    assert catalog.index.assignments.shape[0] == 118
+
+
+# ==== Persistence ====
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_flush_and_reload(tmp_path, dtype):
+    catalog = PostCatalog("jobs", str(tmp_path), dtype=dtype, save_interval=3600)
+    vectors = post_vectors(4)
+    upsert(catalog, ["a", "b", "c", "d"], vectors)
+    catalog.delete(["b"])
+
+    assert catalog.flush() and not catalog.flush()
+
+    reloaded = PostCatalog("jobs", str(tmp_path), dtype=dtype)
+    assert reloaded.ids == catalog.ids
+    assert reloaded.skill_tokens == catalog.skill_tokens and reloaded.experience == catalog.experience
+    assert len(reloaded.vectors) == 3
+    assert closest(reloaded, vectors[3]) == "d"
+
+
+def test_updates_wait_for_the_save_interval(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path), save_interval=3600)
+    upsert(catalog, ["a"], post_vectors(1))
+
+    assert PostCatalog("jobs", str(tmp_path)).ids == []
+
+
+def test_flushed_vectors_are_a_copy(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path), save_interval=3600)
+    vectors = post_vectors(3)
+    upsert(catalog, ["a", "b"], vectors[:2])
+    written = []
+    catalog._write = lambda ids, matrix, skills, experience: written.append(matrix)
+
+    catalog.flush()
+    upsert(catalog, ["a"], vectors[2:])
+
+    np.testing.assert_allclose(written[0][np.array([0])][0], vectors[0], rtol=1e-6)
+
+
+def test_other_fingerprint_discards_the_stored_posts(tmp_path):
+    catalog = PostCatalog("jobs", str(tmp_path), fingerprint=lambda: "model@fp32:a")
+    upsert(catalog, ["a"], post_vectors(1))
+
+    reloaded = PostCatalog("jobs", str(tmp_path), fingerprint=lambda: "model@fp32:b")
+
+    assert reloaded.search(post_vectors(1)[0], 5)[0] == [] and reloaded.vectors is None
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from services.quantized_store import DTYPES, QuantizedMatrix
+
+# Worst-case elementwise error of a round trip, relative to the row's largest value
+TOLERANCE = {"float32": 1e-7, "float16": 1e-3, "int8": 1 / 127}
+
+
+def random_vectors(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def assert_rows_close(matrix: QuantizedMatrix, expected: np.ndarray):
+    tolerance = TOLERANCE[matrix.dtype] * np.abs(expected).max(axis=1, keepdims=True)
+    assert matrix.shape == expected.shape
+    assert np.all(np.abs(matrix.dequantize() - expected) <= tolerance + 1e-7)
+    np.testing.assert_allclose(matrix.norms, np.linalg.norm(expected, axis=1), rtol=1e-6)
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_resized_pads_and_cuts(dtype):
+    vectors = random_vectors(4)
+    matrix = QuantizedMatrix.quantize(vectors, dtype)
+
+    grown = matrix.resized(6)
+
+    assert len(grown) == 6 and grown.dtype == dtype
+    assert_rows_close(grown.head(4), vectors)
+    assert np.all(grown.norms[4:] == 0)
+    assert_rows_close(matrix.resized(2), vectors[:2])
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_set_rows_replaces_in_place(dtype):
+    vectors = random_vectors(5)
+    matrix = QuantizedMatrix.quantize(vectors, dtype).resized(7)
+    update = random_vectors(3, seed=1)
+
+    # Row 1 is replaced, spare rows 5 and 6 are filled
+    matrix.set_rows(np.array([1, 5, 6]), update)
+
+    expected = np.concatenate([vectors, update[1:]])
+    expected[1] = update[0]
+    assert_rows_close(matrix, expected)
+
+
+def test_set_rows_keeps_the_int8_scale_of_untouched_rows():
+    vectors = random_vectors(3)
+    vectors[0] *= 100
+    matrix = QuantizedMatrix.quantize(vectors, "int8")
+    scales = matrix.scales.copy()
+
+    matrix.set_rows(np.array([1]), random_vectors(1, seed=1))
+
+    assert matrix.scales[0] == scales[0] and matrix.scales[2] == scales[2]
+
+
+def test_head_is_a_view():
+    matrix = QuantizedMatrix.quantize(random_vectors(4), "int8")
+    head = matrix.head(2)
+
+    matrix.set_rows(np.array([1]), random_vectors(1, seed=1))
+
+    np.testing.assert_array_equal(head.dequantize(), matrix.dequantize()[:2])
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_copy_is_independent(dtype):
+    vectors = random_vectors(3)
+    matrix = QuantizedMatrix.quantize(vectors, dtype)
+    copy = matrix.copy()
+
+    matrix.set_rows(np.array([0]), random_vectors(1, seed=1))
+
+    assert_rows_close(copy, vectors)
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_move_row_compacts_like_post_catalog_delete(dtype):
+    vectors = random_vectors(5)
+    matrix = QuantizedMatrix.quantize(vectors, dtype)
+
+    # Deleting rows 1 and 3 of 5: the last row fills 1, then the new last row (3) is dropped
+    matrix.move_row(4, 1)
+
+    assert_rows_close(matrix.head(3), vectors[[0, 4, 2]])
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_cosine_after_updates_matches_float32(dtype):
+    vectors = random_vectors(6)
+    query = random_vectors(1, seed=2)[0]
+    matrix = QuantizedMatrix.quantize(vectors[:4], dtype).resized(6)
+    matrix.set_rows(np.array([4, 5]), vectors[4:])
+    matrix.move_row(5, 2)
+    matrix = matrix.head(5)
+
+    expected_rows = vectors[[0, 1, 5, 3, 4]]
+    expected = expected_rows @ query / np.linalg.norm(expected_rows, axis=1)
+    np.testing.assert_allclose(matrix.cosine(query), expected, atol=2e-2 if dtype == "int8" else 2e-3)
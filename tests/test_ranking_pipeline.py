@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import pytest
+
+from services.ranking_pipeline import RankingContext, RankingPipeline, Stage
+
+
+class RecordingScorer:
+    """Stage score function: returns fixed per-post scores and records the candidates it got."""
+
+    def __init__(self, scores):
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.calls = []
+
+    def __call__(self, context, candidates):
+        self.calls.append(candidates.tolist())
+        return self.scores[candidates]
+
+
+def make_context(groups) -> RankingContext:
+    groups = np.asarray(groups)
+    return RankingContext("developer", [{"id": i} for i in range(len(groups))], [""] * len(groups), groups)
+
+
+def seconds_ago(ms: float) -> float:
+    return time.perf_counter() - ms / 1000
+
+
+def test_cutoff_keeps_the_best_candidates_per_group():
+    first = RecordingScorer([1, 5, 3, 2, 9, 4])
+    second = RecordingScorer([0, 1, 2, 3, 4, 5])
+    context = make_context([0, 0, 0, 1, 1, 1])
+
+    ranked, _ = RankingPipeline([Stage("first", first), Stage("second", second, cutoff=2)]).run(context)
+
+    assert sorted(second.calls[0]) == [1, 2, 4, 5]
+    # Posts cut before the second stage drop out; its scores order the rest per group
+    assert ranked.tolist() == [2, 1, 5, 4]
+
+
+def test_optional_stage_is_skipped_once_the_budget_is_spent():
+    rerank = RecordingScorer([0, 0, 9, 0])
+    context = make_context([0, 0, 0, 0])
+    pipeline = RankingPipeline([
+        Stage("first", RecordingScorer([4, 3, 2, 1])),
+        Stage("rerank", rerank, cost_ms=1.0, optional=True),
+    ])
+
+    ranked, metadata = pipeline.run(context, latency_budget_ms=100, started=seconds_ago(500))
+
+    assert rerank.calls == []
+    assert metadata["stages"][1] == {"stage": "rerank", "candidates": 0, "ms": 0.0, "skipped": True}
+    assert ranked.tolist() == [0, 1, 2, 3]
+
+
+def test_optional_stage_is_shrunk_to_what_the_budget_pays_for():
+    n = 20
+    rerank = RecordingScorer(np.arange(2 * n))
+    context = make_context([0] * n + [1] * n)
+    pipeline = RankingPipeline([
+        Stage("first", RecordingScorer(-np.arange(2 * n))),
+        Stage("rerank", rerank, cost_ms=100.0, optional=True),
+    ])
+
+    # About 1050 ms left at 100 ms per candidate: 10 candidates, 5 per group
+    ranked, metadata = pipeline.run(context, latency_budget_ms=1050)
+
+    assert sorted(rerank.calls[0]) == [0, 1, 2, 3, 4, 20, 21, 22, 23, 24]
+    assert metadata["stages"][1]["candidates"] == 10
+    # Reranked posts first, in rerank order, then the rest in first-stage order
+    assert ranked[:n].tolist() == [4, 3, 2, 1, 0] + list(range(5, n))
+
+
+def test_optional_stage_below_min_candidates_is_skipped():
+    rerank = RecordingScorer(np.zeros(10))
+    pipeline = RankingPipeline([
+        Stage("first", RecordingScorer(np.arange(10))),
+        Stage("rerank", rerank, cost_ms=100.0, optional=True, min_candidates=6),
+    ])
+
+    _, metadata = pipeline.run(make_context([0] * 10), latency_budget_ms=550)
+
+    assert rerank.calls == [] and metadata["stages"][1]["skipped"]
+
+
+def test_without_a_budget_optional_stages_score_everything():
+    rerank = RecordingScorer(np.zeros(6))
+    pipeline = RankingPipeline([Stage("rerank", rerank, cost_ms=1000.0, optional=True)])
+
+    pipeline.run(make_context([0, 0, 0, 1, 1, 1]))
+
+    assert sorted(rerank.calls[0]) == list(range(6))
+
+
+def test_required_stages_ignore_the_budget():
+    scorer = RecordingScorer(np.zeros(4))
+    pipeline = RankingPipeline([Stage("semantic", scorer, cost_ms=1000.0)])
+
+    pipeline.run(make_context([0, 0, 0, 0]), latency_budget_ms=1, started=seconds_ago(100))
+
+    assert len(scorer.calls) == 1
+
+
+def test_cost_estimate_skips_the_first_call_then_follows_timings():
+    stage = Stage("rerank", RecordingScorer([]), cost_ms=5.0, cost_smoothing=0.5)
+
+    stage.observe(elapsed_ms=1000.0, n_candidates=10)
+    assert stage.cost_ms == 5.0 and stage.warmed_up
+
+    stage.observe(elapsed_ms=10.0, n_candidates=10)
+    assert stage.cost_ms == pytest.approx(3.0)
+
+    stage.observe(elapsed_ms=0.0, n_candidates=0)
+    assert stage.cost_ms == pytest.approx(3.0)
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.tfidf_store import TfidfStore
+
+POSTS = [
+    "python developer for data pipelines",
+    "java developer for backend services",
+    "python and java for data science",
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Settable stand-in for time.time() in services.tfidf_store."""
+    now = [1_000_000.0]
+    monkeypatch.setattr("services.tfidf_store.time.time", lambda: now[0])
+    return now
+
+
+def make_store(tmp_path, **kwargs) -> TfidfStore:
+    return TfidfStore(str(tmp_path), n_features=2 ** 12, **kwargs)
+
+
+def df_of(store: TfidfStore, text: str) -> np.ndarray:
+    columns = store._count([text])[0][0]
+    return store.df[columns]
+
+
+def test_weights_match_tfidf_vectorizer(tmp_path):
+    store = make_store(tmp_path)
+    query = "python data developer"
+
+    query_row, post_rows = store.transform(query, POSTS, ["a", "b", "c"])
+
+    vectorizer = TfidfVectorizer().fit(POSTS)
+    expected = (vectorizer.transform(POSTS) @ vectorizer.transform([query]).T).toarray().ravel()
+    np.testing.assert_allclose((post_rows @ query_row.T).toarray().ravel(), expected, rtol=1e-6)
+
+
+def test_each_post_counts_once(tmp_path):
+    store = make_store(tmp_path)
+
+    store.counts(POSTS, ["a", "b", "c"])
+    store.counts(POSTS[:2], ["a", "b"])
+
+    assert store.n_docs == 3
+    assert df_of(store, "developer").tolist() == [2]
+    assert store.hits == 2
+
+
+def test_changed_text_replaces_the_posts_terms(tmp_path):
+    store = make_store(tmp_path)
+    store.counts(POSTS, ["a", "b", "c"])
+
+    store.counts(["rust developer"], ["a"])
+
+    assert store.n_docs == 3 and store.replaced == 1
+    assert df_of(store, "pipelines").tolist() == [0]
+    assert df_of(store, "rust").tolist() == [1]
+    assert df_of(store, "developer").tolist() == [2]
+
+
+def test_without_ids_a_text_is_its_own_post(tmp_path):
+    store = make_store(tmp_path)
+
+    store.counts(POSTS)
+    store.counts(["rust developer", POSTS[0]])
+
+    assert store.n_docs == 4
+
+
+def test_posts_not_seen_for_the_ttl_are_pruned(tmp_path, clock):
+    store = make_store(tmp_path, doc_ttl_seconds=100, prune_interval=10)
+    store.counts(POSTS[:2], ["a", "b"])
+
+    clock[0] += 60
+    store.counts(POSTS[1:], ["b", "c"])
+    clock[0] += 60
+    store.counts(POSTS[2:], ["c"])
+
+    # a was last seen 120 s ago; b 60 s ago
+    assert store.n_docs == 2 and store.expired == 1
+    assert df_of(store, "pipelines").tolist() == [0]
+    assert df_of(store, "java").tolist() == [2]
+
+
+def test_no_ttl_keeps_every_post(tmp_path, clock):
+    store = make_store(tmp_path, doc_ttl_seconds=0, prune_interval=0)
+    store.counts(POSTS, ["a", "b", "c"])
+
+    clock[0] += 10 ** 9
+    store.counts(POSTS[:1], ["a"])
+
+    assert store.n_docs == 3 and store.expired == 0
+
+
+def test_save_and_reload_rebuild_df(tmp_path):
+    store = make_store(tmp_path)
+    store.counts(POSTS, ["a", "b", "c"])
+    store.counts(["rust developer"], ["a"])
+    store.save()
+
+    reloaded = make_store(tmp_path)
+
+    assert reloaded.n_docs == 3
+    np.testing.assert_array_equal(reloaded.df, store.df)
+    reloaded.counts(["rust developer"], ["a"])
+    assert reloaded.replaced == 0
+
+
+def test_saves_every_n_changes(tmp_path):
+    store = make_store(tmp_path, save_every=2)
+
+    store.counts(POSTS, ["a", "b", "c"])
+
+    assert make_store(tmp_path).n_docs == 3
+
+
+def test_other_n_features_discards_the_saved_stats(tmp_path):
+    store = make_store(tmp_path)
+    store.counts(POSTS, ["a", "b", "c"])
+    store.save()
+
+    reloaded = TfidfStore(str(tmp_path), n_features=2 ** 10)
+
+    assert reloaded.n_docs == 0 and not reloaded.df.any()
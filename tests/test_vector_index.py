@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from services.quantized_store import QuantizedMatrix
+from services.vector_index import ExactIndex, IVFIndex, make_index, normalize_rows
+
+
+def clustered_vectors(n: int, n_clusters: int = 8, dim: int = 16, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.normal(size=(n_clusters, dim)))
+    labels = rng.integers(n_clusters, size=n)
+    return normalize_rows(centers[labels] + 0.1 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def exact_top(vectors, query, k: int) -> np.ndarray:
+    return ExactIndex().search(query, vectors, k)
+
+
+def test_below_min_train_size_is_exact():
+    vectors = clustered_vectors(50)
+    index = IVFIndex(min_train_size=100)
+    index.maybe_train(vectors)
+
+    assert index.centroids is None
+    np.testing.assert_array_equal(index.search(vectors[0], vectors, 5), exact_top(vectors, vectors[0], 5))
+
+
+def test_probing_every_list_is_exact():
+    vectors = clustered_vectors(500)
+    index = IVFIndex(n_lists=10, n_probe=10, min_train_size=100)
+    index.maybe_train(vectors)
+
+    for query in vectors[:20]:
+        assert set(index.search(query, vectors, 10)) == set(exact_top(vectors, query, 10))
+
+
+def test_recall_on_clustered_data():
+    vectors = clustered_vectors(2000)
+    queries = clustered_vectors(50, seed=1)
+    index = IVFIndex(n_lists=16, n_probe=4, min_train_size=100)
+    index.maybe_train(vectors)
+
+    recall = np.mean([
+        len(set(index.search(query, vectors, 10)) & set(exact_top(vectors, query, 10))) / 10
+        for query in queries
+    ])
+    assert recall >= 0.9
+
+
+def test_set_rows_indexes_appended_rows():
+    vectors = clustered_vectors(400)
+    index = IVFIndex(n_lists=8, n_probe=2, min_train_size=100)
+    index.maybe_train(vectors)
+
+    added = clustered_vectors(10, seed=2)
+    vectors = np.concatenate([vectors, added])
+    index.set_rows(np.arange(400, 410), added)
+
+    assert index.assignments.shape[0] == 410
+    assert 405 in index.search(added[5], vectors, 1)
+
+
+def test_move_and_truncate_follow_a_delete():
+    vectors = clustered_vectors(300)
+    index = IVFIndex(n_lists=8, n_probe=2, min_train_size=100)
+    index.maybe_train(vectors)
+    moved_list = index.assignments[299]
+
+    # PostCatalog.delete of row 10: the last row moves into it and the matrix shrinks
+    index.move(299, 10)
+    index.truncate(299)
+    vectors = np.concatenate([vectors[:10], vectors[299:], vectors[11:299]])
+
+    assert index.assignments.shape[0] == 299
+    assert index.assignments[10] == moved_list
+    assert 10 in index.search(vectors[10], vectors, 1)
+
+
+def test_out_of_sync_assignments_fall_back_to_exact():
+    vectors = clustered_vectors(300)
+    index = IVFIndex(n_lists=8, n_probe=1, min_train_size=100)
+    index.maybe_train(vectors)
+
+    grown = np.concatenate([vectors, clustered_vectors(5, seed=3)])
+    np.testing.assert_array_equal(index.search(grown[-1], grown, 5), exact_top(grown, grown[-1], 5))
+
+
+def test_retrains_once_the_catalog_doubles():
+    index = IVFIndex(min_train_size=100)
+    index.maybe_train(clustered_vectors(100))
+    centroids = index.centroids
+
+    index.maybe_train(clustered_vectors(200))
+    assert index.centroids is centroids
+
+    index.maybe_train(clustered_vectors(201))
+    assert index.centroids is not centroids
+    assert index.trained_size == 201
+
+
+def test_reset_forgets_training():
+    vectors = clustered_vectors(200)
+    index = IVFIndex(min_train_size=100)
+    index.maybe_train(vectors)
+
+    index.reset()
+
+    assert index.centroids is None and index.trained_size == 0
+    np.testing.assert_array_equal(index.search(vectors[0], vectors, 5), exact_top(vectors, vectors[0], 5))
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_searches_quantized_vectors(dtype):
+    vectors = clustered_vectors(500)
+    matrix = QuantizedMatrix.quantize(vectors, dtype)
+    index = IVFIndex(n_lists=10, n_probe=10, min_train_size=100)
+    index.maybe_train(matrix)
+
+    assert index.search(vectors[7], matrix, 1)[0] == 7
+
+
+def test_make_index_rejects_unknown_kinds():
+    assert isinstance(make_index("ivf", n_probe=4), IVFIndex)
+    with pytest.raises(ValueError):
+        make_index("hnsw")